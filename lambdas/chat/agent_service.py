@@ -8,6 +8,7 @@ import logging
 import re
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+from functools import lru_cache
 
 import yaml
 import boto3
@@ -23,6 +24,19 @@ from posthog.ai.langchain import CallbackHandler
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# libyaml's C loader parses the large prompt config several times faster
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+
+@lru_cache(maxsize=4)
+def _load_config(config_path: str) -> dict:
+    """Parse agent_config.yaml once per path; callers must treat it as read-only"""
+    with open(config_path, 'r') as f:
+        return yaml.load(f, Loader=_YamlLoader)
+
 # DynamoDB setup for user data access
 dynamodb = boto3.resource('dynamodb')
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'dev')
@@ -95,6 +109,16 @@ Versiful is a service that provides personalized biblical guidance and wisdom th
 Your conversations are private and secure. We take your privacy seriously and never share your personal information."""
 
 
+# Guardrail patterns, compiled once. Crisis keywords match anywhere in the
+# message (like a substring check) so variants such as "suicides" still trigger
+CRISIS_KEYWORDS = [
+    'suicide', 'suicidal', 'kill myself', 'end my life',
+    'self harm', 'hurt myself', 'want to die'
+]
+_CRISIS_RE = re.compile('|'.join(map(re.escape, CRISIS_KEYWORDS)), re.IGNORECASE)
+_PROFANITY_RE = re.compile(r'\b(fuck|shit|damn|bitch|ass)\b', re.IGNORECASE)
+
+
 class AgentService:
     """
     LangChain-based agent service for biblical guidance
@@ -113,8 +137,7 @@ class AgentService:
         if config_path is None:
             config_path = os.path.join(os.path.dirname(__file__), 'agent_config.yaml')
         
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+        self.config = _load_config(config_path)
         
         # Set API key
         if api_key:
@@ -126,9 +149,16 @@ class AgentService:
         if posthog_key:
             try:
                 # Initialize EXACTLY as in the working test - positional args, not named
+                # Small batches on a short interval let the consumer threads
+                # ship events while the LLM call is still running, so the
+                # flush at the end of each message has little left to send
                 self.posthog = Posthog(
                     posthog_key,
-                    host='https://us.i.posthog.com'
+                    host='https://us.i.posthog.com',
+                    flush_at=20,
+                    flush_interval=0.5,
+                    thread=4,
+                    disabled=bool(os.environ.get('CI_NO_POSTHOG'))
                 )
                 logger.info("PostHog initialized successfully")
             except Exception as e:
@@ -166,23 +196,14 @@ class AgentService:
         Check for sensitive topics and content filtering
         Returns: (needs_crisis_intervention, crisis_response, is_off_topic)
         """
-        message_lower = message.lower()
-        
         # Check for crisis keywords
-        crisis_keywords = [
-            'suicide', 'suicidal', 'kill myself', 'end my life', 
-            'self harm', 'hurt myself', 'want to die'
-        ]
-        
-        for keyword in crisis_keywords:
-            if keyword in message_lower:
-                logger.warning("Crisis intervention triggered")
-                return True, self.config['guardrails']['crisis_response'], False
+        if _CRISIS_RE.search(message):
+            logger.warning("Crisis intervention triggered")
+            return True, self.config['guardrails']['crisis_response'], False
         
         # Check for profanity (basic check)
         if self.config['guardrails'].get('filter_profanity', True):
-            profanity_pattern = r'\b(fuck|shit|damn|bitch|ass)\b'
-            if re.search(profanity_pattern, message_lower, re.IGNORECASE):
+            if _PROFANITY_RE.search(message):
                 logger.info("Profanity detected, will redirect conversation")
                 return False, None, True
         
@@ -6,6 +6,7 @@ import os
 import json
 import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from decimal import Decimal
@@ -19,6 +20,9 @@ from helpers import get_secret
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Runs the conversation title LLM call alongside the main agent call
+_title_executor = ThreadPoolExecutor(max_workers=2)
+
 # DynamoDB setup
 dynamodb = boto3.resource('dynamodb')
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'dev')
@@ -280,6 +284,23 @@ def process_chat_message(
         
         # Get agent and process
         agent = get_agent()
+        
+        # Web sessions get a title on the first message, then every 5 messages.
+        # The title only depends on the incoming message/history, so start it
+        # now and let it run while the agent builds the reply.
+        title_future = None
+        history_length = len(history)
+        if channel == 'web' and user_id and session_id and history_length % 5 == 0:
+            # For first message, use just that message. For updates, use recent history
+            messages_for_title = [{'role': 'user', 'content': message}] if history_length == 0 else history[-10:]
+            title_future = _title_executor.submit(
+                agent.get_conversation_title,
+                messages=messages_for_title,
+                thread_id=thread_id,
+                user_id=user_id,
+                trace_id=str(uuid.uuid4())  # Separate trace_id, should not share with message trace
+            )
+        
         result = agent.process_message(
             thread_id=thread_id,
             message=message,
@@ -317,23 +338,8 @@ def process_chat_message(
         
         # Update session metadata if web channel
         if channel == 'web' and user_id and session_id:
-            # Generate title on first message, then regenerate every 5 messages
-            history_length = len(history)
-            if history_length == 0 or (history_length > 0 and history_length % 5 == 0):
-                # Generate NEW trace_id for title generation (should not share with message trace)
-                import uuid
-                title_trace_id = str(uuid.uuid4())
-                
-                # For first message, use just that message. For updates, use recent history
-                messages_for_title = [{'role': 'user', 'content': message}] if history_length == 0 else history[-10:]
-                
-                title = agent.get_conversation_title(
-                    messages=messages_for_title,
-                    thread_id=thread_id,
-                    user_id=user_id,
-                    trace_id=title_trace_id  # Use separate trace_id for title generation
-                )
-                update_session_metadata(user_id, session_id, title=title, increment_count=True)
+            if title_future is not None:
+                update_session_metadata(user_id, session_id, title=title_future.result(), increment_count=True)
             else:
                 update_session_metadata(user_id, session_id, increment_count=True)
         
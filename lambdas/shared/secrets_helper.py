@@ -5,6 +5,8 @@ Provides caching to avoid repeated API calls within same Lambda execution.
 import boto3
 import json
 import os
+import urllib.parse
+import urllib.request
 from functools import lru_cache
 
 secrets_client = boto3.client('secretsmanager')
@@ -21,6 +23,15 @@ def get_secrets():
     if not secret_arn:
         raise ValueError("SECRET_ARN environment variable not set")
     
+    # Prefer the Parameters and Secrets Lambda Extension when it is attached:
+    # it serves from a local cache instead of a Secrets Manager round-trip
+    extension_port = os.environ.get('PARAMETERS_SECRETS_EXTENSION_HTTP_PORT')
+    if extension_port:
+        try:
+            return _get_secrets_from_extension(secret_arn, extension_port)
+        except Exception as e:
+            print(f"Secrets extension unavailable, falling back to Secrets Manager: {e}")
+    
     try:
         response = secrets_client.get_secret_value(SecretId=secret_arn)
         return json.loads(response['SecretString'])
@@ -29,6 +40,17 @@ def get_secrets():
         raise
 
 
+def _get_secrets_from_extension(secret_arn, port):
+    """Fetch the secret from the Parameters and Secrets Lambda Extension on localhost"""
+    url = f"http://localhost:{port}/secretsmanager/get?secretId={urllib.parse.quote(secret_arn, safe='')}"
+    request = urllib.request.Request(
+        url,
+        headers={'X-Aws-Parameters-Secrets-Token': os.environ['AWS_SESSION_TOKEN']}
+    )
+    with urllib.request.urlopen(request, timeout=2) as response:
+        return json.loads(json.loads(response.read())['SecretString'])
+
+
 def get_secret(key):
     """
     Get a specific secret by key.
@@ -5,6 +5,9 @@ Provides functions to send lifecycle SMS notifications to users
 import os
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client
 
 logger = logging.getLogger()
@@ -33,8 +36,32 @@ def get_vcard_url(environment=None):
         return f"https://{environment}.{VERSIFUL_DOMAIN}/versiful-contact.vcf"
 
 
+# Twilio clients by (account SID, auth token). Reusing the client keeps its
+# HTTP session, so consecutive sends (e.g. welcome text + vCard) share one TLS
+# connection; a rotated token gets a fresh client
+_TWILIO_CLIENTS = {}
+
+# Connections kept open to api.twilio.com; matches the most sends
+# send_sms_batch runs at once, so concurrent workers don't drop sockets
+TWILIO_POOL_SIZE = 20
+
+
+def get_cached_twilio_client(account_sid: str, auth_token: str):
+    """Return the Twilio client for these credentials, creating it once per container"""
+    key = (account_sid, auth_token)
+    client = _TWILIO_CLIENTS.get(key)
+    if client is None:
+        # Drop clients built with a token that has since been rotated
+        for stale in [k for k in _TWILIO_CLIENTS if k[0] == account_sid]:
+            del _TWILIO_CLIENTS[stale]
+        http_client = TwilioHttpClient()
+        http_client.session.mount("https://", HTTPAdapter(pool_maxsize=TWILIO_POOL_SIZE))
+        client = _TWILIO_CLIENTS[key] = Client(account_sid, auth_token, http_client=http_client)
+    return client
+
+
 def get_twilio_client():
-    """Initialize and return Twilio client"""
+    """Return the Twilio client for the configured account"""
     secrets = get_secrets()
     account_sid = secrets.get("twilio_account_sid")
     auth_token = secrets.get("twilio_auth")
@@ -42,7 +69,7 @@ def get_twilio_client():
     if not account_sid or not auth_token:
         raise ValueError("Twilio credentials not found in secrets")
     
-    return Client(account_sid, auth_token)
+    return get_cached_twilio_client(account_sid, auth_token)
 
 
 def send_sms(phone_number: str, message: str, media_url: str = None):
@@ -81,6 +108,36 @@ def send_sms(phone_number: str, message: str, media_url: str = None):
         return None
 
 
+def send_sms_batch(items, max_workers: int = 10):
+    """
+    Send many SMS messages concurrently over one shared Twilio client
+    
+    Twilio queues messages beyond the sender number's throughput itself, so
+    the workers only overlap API round trips.
+    
+    Args:
+        items: Iterable of (phone_number, message) pairs
+        max_workers: Maximum number of sends in flight (capped at TWILIO_POOL_SIZE)
+    
+    Returns:
+        List of message_sid (None for failures), in the order of items
+    """
+    items = list(items)
+    if not items:
+        return []
+    
+    # Build the client before fanning out so workers don't race to create it
+    try:
+        get_twilio_client()
+    except Exception as e:
+        logger.error(f"Failed to send SMS batch of {len(items)}: {str(e)}")
+        return [None] * len(items)
+    
+    workers = min(max_workers, TWILIO_POOL_SIZE, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda item: send_sms(*item), items))
+
+
 def send_welcome_sms(phone_number: str, first_name: str = None):
     """
     Send welcome message when user first registers their phone number
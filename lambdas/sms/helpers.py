@@ -5,13 +5,19 @@ from typing import Optional
 from datetime import datetime, timezone
 from urllib.parse import parse_qs
 import re
+import time
 
 import boto3
 import requests
 from botocore.exceptions import ClientError
-from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
 
+try:
+    from sms_notifications import get_cached_twilio_client
+except ImportError:
+    # Fallback for local testing
+    from lambdas.shared.sms_notifications import get_cached_twilio_client
+
 # Setup logging
 logger = logging.getLogger()
 
@@ -71,20 +77,36 @@ def normalize_phone_number(raw: str) -> Optional[str]:
 
 
 # ---------- Secrets / outbound helpers ----------
-def get_secret():
-    secret_name = f"{ENVIRONMENT}-versiful_secrets"
-    region_name = "us-east-1"
+# Parsed secrets by name -> (expiry, dict). Refreshed hourly so a rotated
+# secret is picked up without a redeploy
+SECRET_TTL_SECONDS = 3600
+_secret_cache = {}
+_secrets_client = None
+
+
+def _load_secret(secret_name):
+    """Fetch and parse a JSON secret, reusing it for SECRET_TTL_SECONDS."""
+    global _secrets_client
+    cached = _secret_cache.get(secret_name)
+    if cached and time.monotonic() < cached[0]:
+        return cached[1]
 
-    session = boto3.session.Session()
-    client = session.client(service_name="secretsmanager", region_name=region_name)
+    if _secrets_client is None:
+        session = boto3.session.Session()
+        _secrets_client = session.client(service_name="secretsmanager", region_name="us-east-1")
 
     try:
-        get_secret_value_response = client.get_secret_value(SecretId=secret_name)
+        get_secret_value_response = _secrets_client.get_secret_value(SecretId=secret_name)
     except ClientError as e:
         raise e
 
-    secret = get_secret_value_response["SecretString"]
-    return json.loads(secret)
+    secret = json.loads(get_secret_value_response["SecretString"])
+    _secret_cache[secret_name] = (time.monotonic() + SECRET_TTL_SECONDS, secret)
+    return secret
+
+
+def get_secret():
+    return _load_secret(f"{ENVIRONMENT}-versiful_secrets")
 
 
 def generate_response(message, model="gpt-4o"):
@@ -152,19 +174,8 @@ def generate_photo(prompt):
 
 
 def get_twilio_secrets():
-    secret_name = f"{ENVIRONMENT}-versiful_secrets"
-    region_name = "us-east-1"
-
-    session = boto3.session.Session()
-    client = session.client(service_name="secretsmanager", region_name=region_name)
-
-    try:
-        get_secret_value_response = client.get_secret_value(SecretId=secret_name)
-    except ClientError as e:
-        raise e
-
-    secret = get_secret_value_response["SecretString"]
-    return json.loads(secret)
+    # Same secret as get_secret, so both share one cached fetch
+    return _load_secret(f"{ENVIRONMENT}-versiful_secrets")
 
 
 def send_message(to_num, message):
@@ -176,10 +187,7 @@ def send_message(to_num, message):
     """
     try:
         twilio_auth = get_twilio_secrets()
-        account_sid = twilio_auth["twilio_account_sid"]
-        auth_token = twilio_auth["twilio_auth"]
-
-        client = Client(account_sid, auth_token)
+        client = get_cached_twilio_client(twilio_auth["twilio_account_sid"], twilio_auth["twilio_auth"])
 
         # Enable smart encoding to reduce UCS2 segments by converting to GSM-7 when possible
         twilio_message = client.messages.create(
@@ -3,33 +3,83 @@ Unit tests for the Stripe webhook handler Lambda
 """
 import json
 import pytest
+from collections import ChainMap
+from types import MappingProxyType
+from typing import NamedTuple
 from unittest.mock import Mock, patch, MagicMock
-import sys
 import os
 
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(__file__))
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
-
 # Mock environment variables before importing handler
 os.environ['ENVIRONMENT'] = 'test'
 os.environ['PROJECT_NAME'] = 'versiful'
 os.environ['SECRET_ARN'] = 'arn:aws:secretsmanager:us-east-1:123456789012:secret:test-secret'
 
+# The handler prefers the top-level secrets_helper (as deployed from the layer),
+# which other test modules may have put on sys.path; patch whichever it will bind
+try:
+    import secrets_helper as _secrets_helper
+except ImportError:
+    from lambdas.shared import secrets_helper as _secrets_helper
+
 # Mock the secrets and stripe initialization
-with patch('secrets_helper.get_secret', return_value='sk_test_fake_key'):
-    with patch('secrets_helper.get_secrets', return_value={'stripe_webhook_secret': 'whsec_test'}):
-        import webhook_handler
+with patch.object(_secrets_helper, 'get_secret', return_value='sk_test_fake_key'):
+    with patch.object(_secrets_helper, 'get_secrets', return_value={'stripe_webhook_secret': 'whsec_test'}):
+        from lambdas.stripe_webhook import webhook_handler
+
+# construct_event is always mocked, so the raw body is never parsed
+_STUB_BODY = '{}'
+_SIG_HEADERS = MappingProxyType({'stripe-signature': 'sig'})
+
+
+class LambdaEvent(NamedTuple):
+    """Minimal API Gateway event; get() mirrors the dict access the handler uses"""
+    body: str
+    headers: dict
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+def _items(interval):
+    """Read-only subscription items payload for a given billing interval"""
+    return MappingProxyType({
+        'data': (MappingProxyType({
+            'price': MappingProxyType({
+                'recurring': MappingProxyType({'interval': interval})
+            })
+        }),)
+    })
+
+
+_MONTHLY_ITEMS = _items('month')
+_ANNUAL_ITEMS = _items('year')
+
+# Shared read-only Stripe subscription; tests layer overrides via sub_with()
+_BASE_SUB = MappingProxyType({
+    'id': 'sub_test123',
+    'customer': 'cus_test123',
+    'status': 'active',
+    'current_period_end': 1735689600,  # Unix timestamp (int)
+    'cancel_at_period_end': False,
+    'items': _MONTHLY_ITEMS,
+})
+
+
+def sub_with(**overrides):
+    """Subscription view with per-test overrides on top of the base template"""
+    return ChainMap(overrides, _BASE_SUB)
 
 
 class TestWebhookSignatureVerification:
     """Test webhook signature verification"""
     
-    @patch('webhook_handler.stripe.Webhook.construct_event')
-    def test_valid_signature(self, mock_construct_event):
-        """Test that valid signatures are accepted"""
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Webhook.construct_event', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.get_secrets')
+    def test_signature(self, mock_get_secrets, mock_construct_event, subtests):
+        """Test that valid signatures are accepted and invalid ones rejected"""
+        mock_get_secrets.return_value = {'stripe_webhook_secret': 'whsec_test'}
         # Mock a valid Stripe event
-        mock_event = {
+        mock_construct_event.return_value = {
             'type': 'customer.subscription.created',
             'data': {
                 'object': {
@@ -40,51 +90,32 @@ class TestWebhookSignatureVerification:
                 }
             }
         }
-        mock_construct_event.return_value = mock_event
-        
-        event = {
-            'body': json.dumps({'test': 'data'}),
-            'headers': {
-                'stripe-signature': 'valid_signature'
-            }
-        }
-        
-        with patch('webhook_handler.table.update_item') as mock_update:
-            response = webhook_handler.handler(event, {})
-            
-            assert response['statusCode'] == 200
-            mock_construct_event.assert_called_once()
-    
-    @patch('webhook_handler.stripe.Webhook.construct_event')
-    @patch('webhook_handler.get_secrets')
-    def test_invalid_signature(self, mock_get_secrets, mock_construct_event):
-        """Test that invalid signatures are rejected"""
-        # Mock signature verification failure
-        import stripe
-        mock_construct_event.side_effect = stripe.error.SignatureVerificationError(
+        invalid = webhook_handler.stripe.error.SignatureVerificationError(
             "Invalid signature", "sig_header"
         )
-        mock_get_secrets.return_value = {'stripe_webhook_secret': 'whsec_test'}
-        
-        event = {
-            'body': json.dumps({'test': 'data'}),
-            'headers': {
-                'stripe-signature': 'invalid_signature'
-            }
-        }
-        
-        response = webhook_handler.handler(event, {})
         
-        assert response['statusCode'] == 400
+        for sig, error, expected_status in [
+            ('valid_signature', None, 200),
+            ('invalid_signature', invalid, 400),
+        ]:
+            with subtests.test(sig=sig):
+                mock_construct_event.reset_mock()
+                mock_construct_event.side_effect = error
+                
+                event = LambdaEvent(_STUB_BODY, {'stripe-signature': sig})
+                response = webhook_handler.handler(event, {})
+                
+                assert response['statusCode'] == expected_status
+                mock_construct_event.assert_called_once()
 
 
 class TestCheckoutCompleted:
     """Test handling of checkout.session.completed events"""
     
-    @patch('webhook_handler.stripe.Subscription.retrieve')
-    @patch('webhook_handler.stripe.Webhook.construct_event')
-    @patch('webhook_handler.get_secrets')
-    @patch('webhook_handler.table.update_item')
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Subscription.retrieve', autospec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Webhook.construct_event', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.get_secrets')
+    @patch('lambdas.stripe_webhook.webhook_handler.table.update_item', spec=True)
     def test_checkout_completed_monthly_subscription(
         self, 
         mock_update, 
@@ -94,22 +125,8 @@ class TestCheckoutCompleted:
     ):
         """Test that checkout.completed creates subscription with correct values"""
         # Mock Stripe subscription response
-        mock_retrieve_sub.return_value = {
-            'id': 'sub_test123',
-            'customer': 'cus_test123',
-            'status': 'active',
-            'current_period_end': 1735689600,  # Unix timestamp (int)
-            'cancel_at_period_end': False,
-            'items': {
-                'data': [{
-                    'price': {
-                        'recurring': {
-                            'interval': 'month'
-                        }
-                    }
-                }]
-            }
-        }
+        mock_retrieve_sub.return_value = sub_with()
+        mock_update.return_value = {'Attributes': {'userId': 'user-123'}}
         
         mock_event = {
             'type': 'checkout.session.completed',
@@ -125,10 +142,7 @@ class TestCheckoutCompleted:
         mock_construct_event.return_value = mock_event
         mock_get_secrets.return_value = {'stripe_webhook_secret': 'whsec_test'}
         
-        event = {
-            'body': json.dumps(mock_event),
-            'headers': {'stripe-signature': 'sig'}
-        }
+        event = LambdaEvent(_STUB_BODY, _SIG_HEADERS)
         
         response = webhook_handler.handler(event, {})
         
@@ -153,11 +167,14 @@ class TestCheckoutCompleted:
         
         # Check that plan is 'monthly'
         assert call_args['ExpressionAttributeValues'][':plan'] == 'monthly'
+        
+        # Updated record is returned so the phone lookup needs no extra read
+        assert call_args['ReturnValues'] == 'ALL_NEW'
     
-    @patch('webhook_handler.stripe.Subscription.retrieve')
-    @patch('webhook_handler.stripe.Webhook.construct_event')
-    @patch('webhook_handler.get_secrets')
-    @patch('webhook_handler.table.update_item')
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Subscription.retrieve', autospec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Webhook.construct_event', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.get_secrets')
+    @patch('lambdas.stripe_webhook.webhook_handler.table.update_item', spec=True)
     def test_checkout_completed_annual_subscription(
         self, 
         mock_update, 
@@ -166,22 +183,13 @@ class TestCheckoutCompleted:
         mock_retrieve_sub
     ):
         """Test that checkout.completed handles annual subscriptions correctly"""
-        mock_retrieve_sub.return_value = {
-            'id': 'sub_test456',
-            'customer': 'cus_test456',
-            'status': 'active',
-            'current_period_end': 1767225600,  # Unix timestamp
-            'cancel_at_period_end': False,
-            'items': {
-                'data': [{
-                    'price': {
-                        'recurring': {
-                            'interval': 'year'
-                        }
-                    }
-                }]
-            }
-        }
+        mock_retrieve_sub.return_value = sub_with(
+            id='sub_test456',
+            customer='cus_test456',
+            current_period_end=1767225600,
+            items=_ANNUAL_ITEMS,
+        )
+        mock_update.return_value = {'Attributes': {'userId': 'user-456'}}
         
         mock_event = {
             'type': 'checkout.session.completed',
@@ -197,10 +205,7 @@ class TestCheckoutCompleted:
         mock_construct_event.return_value = mock_event
         mock_get_secrets.return_value = {'stripe_webhook_secret': 'whsec_test'}
         
-        event = {
-            'body': json.dumps(mock_event),
-            'headers': {'stripe-signature': 'sig'}
-        }
+        event = LambdaEvent(_STUB_BODY, _SIG_HEADERS)
         
         response = webhook_handler.handler(event, {})
         
@@ -216,9 +221,9 @@ class TestCheckoutCompleted:
 class TestSubscriptionCreated:
     """Test handling of subscription.created events"""
     
-    @patch('webhook_handler.stripe.Webhook.construct_event')
-    @patch('webhook_handler.get_secrets')
-    @patch('webhook_handler.table.update_item')
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Webhook.construct_event', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.get_secrets')
+    @patch('lambdas.stripe_webhook.webhook_handler.table.update_item', spec=True)
     def test_subscription_created_sets_unlimited(
         self, 
         mock_update,
@@ -240,10 +245,7 @@ class TestSubscriptionCreated:
         mock_construct_event.return_value = mock_event
         mock_get_secrets.return_value = {'stripe_webhook_secret': 'whsec_test'}
         
-        event = {
-            'body': json.dumps(mock_event),
-            'headers': {'stripe-signature': 'sig'}
-        }
+        event = LambdaEvent(_STUB_BODY, _SIG_HEADERS)
         
         response = webhook_handler.handler(event, {})
         
@@ -253,22 +255,22 @@ class TestSubscriptionCreated:
 class TestSubscriptionUpdated:
     """Test handling of subscription.updated events"""
     
-    @patch('webhook_handler.stripe.Subscription.retrieve')
-    @patch('webhook_handler.stripe.Webhook.construct_event')
-    @patch('webhook_handler.get_secrets')
-    @patch('webhook_handler.table.scan')
-    @patch('webhook_handler.table.update_item')
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Subscription.retrieve', autospec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Webhook.construct_event', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.get_secrets')
+    @patch('lambdas.stripe_webhook.webhook_handler.table.query', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.table.update_item', spec=True)
     def test_subscription_updated_active(
         self, 
         mock_update,
-        mock_scan,
+        mock_query,
         mock_get_secrets,
         mock_construct_event,
         mock_retrieve_sub
     ):
         """Test that subscription.updated with active status maintains subscription"""
-        # Mock the scan to find the user
-        mock_scan.return_value = {
+        # Mock the GSI query to find the user
+        mock_query.return_value = {
             'Items': [{
                 'userId': 'user-123',
                 'email': 'test@example.com',
@@ -279,31 +281,13 @@ class TestSubscriptionUpdated:
         mock_event = {
             'type': 'customer.subscription.updated',
             'data': {
-                'object': {
-                    'id': 'sub_test123',
-                    'customer': 'cus_test123',
-                    'status': 'active',
-                    'current_period_end': 1735689600,  # Unix timestamp
-                    'cancel_at_period_end': False,
-                    'items': {
-                        'data': [{
-                            'price': {
-                                'recurring': {
-                                    'interval': 'month'
-                                }
-                            }
-                        }]
-                    }
-                }
+                'object': sub_with()
             }
         }
         mock_construct_event.return_value = mock_event
         mock_get_secrets.return_value = {'stripe_webhook_secret': 'whsec_test'}
         
-        event = {
-            'body': json.dumps(mock_event),
-            'headers': {'stripe-signature': 'sig'}
-        }
+        event = LambdaEvent(_STUB_BODY, _SIG_HEADERS)
         
         response = webhook_handler.handler(event, {})
         
@@ -321,19 +305,19 @@ class TestSubscriptionUpdated:
         assert isinstance(period_end, int), \
             f"current_period_end must be int, got {type(period_end)}"
     
-    @patch('webhook_handler.stripe.Webhook.construct_event')
-    @patch('webhook_handler.get_secrets')
-    @patch('webhook_handler.table.scan')
-    @patch('webhook_handler.table.update_item')
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Webhook.construct_event', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.get_secrets')
+    @patch('lambdas.stripe_webhook.webhook_handler.table.query', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.table.update_item', spec=True)
     def test_subscription_updated_canceled(
         self, 
         mock_update,
-        mock_scan,
+        mock_query,
         mock_get_secrets,
         mock_construct_event
     ):
         """Test that subscription.updated with canceled status removes subscription"""
-        mock_scan.return_value = {
+        mock_query.return_value = {
             'Items': [{
                 'userId': 'user-123',
                 'stripeCustomerId': 'cus_test123'
@@ -343,31 +327,13 @@ class TestSubscriptionUpdated:
         mock_event = {
             'type': 'customer.subscription.updated',
             'data': {
-                'object': {
-                    'id': 'sub_test123',
-                    'customer': 'cus_test123',
-                    'status': 'canceled',
-                    'current_period_end': 1735689600,
-                    'cancel_at_period_end': True,
-                    'items': {
-                        'data': [{
-                            'price': {
-                                'recurring': {
-                                    'interval': 'month'
-                                }
-                            }
-                        }]
-                    }
-                }
+                'object': sub_with(status='canceled', cancel_at_period_end=True)
             }
         }
         mock_construct_event.return_value = mock_event
         mock_get_secrets.return_value = {'stripe_webhook_secret': 'whsec_test'}
         
-        event = {
-            'body': json.dumps(mock_event),
-            'headers': {'stripe-signature': 'sig'}
-        }
+        event = LambdaEvent(_STUB_BODY, _SIG_HEADERS)
         
         response = webhook_handler.handler(event, {})
         
@@ -382,19 +348,19 @@ class TestSubscriptionUpdated:
 class TestSubscriptionDeleted:
     """Test handling of subscription.deleted events"""
     
-    @patch('webhook_handler.stripe.Webhook.construct_event')
-    @patch('webhook_handler.get_secrets')
-    @patch('webhook_handler.table.scan')
-    @patch('webhook_handler.table.update_item')
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Webhook.construct_event', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.get_secrets')
+    @patch('lambdas.stripe_webhook.webhook_handler.table.query', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.table.update_item', spec=True)
     def test_subscription_deleted_removes_subscription(
         self, 
         mock_update,
-        mock_scan,
+        mock_query,
         mock_get_secrets,
         mock_construct_event
     ):
         """Test that subscription.deleted removes subscription and resets to free"""
-        mock_scan.return_value = {
+        mock_query.return_value = {
             'Items': [{
                 'userId': 'user-123',
                 'stripeCustomerId': 'cus_test123'
@@ -413,10 +379,7 @@ class TestSubscriptionDeleted:
         mock_construct_event.return_value = mock_event
         mock_get_secrets.return_value = {'stripe_webhook_secret': 'whsec_test'}
         
-        event = {
-            'body': json.dumps(mock_event),
-            'headers': {'stripe-signature': 'sig'}
-        }
+        event = LambdaEvent(_STUB_BODY, _SIG_HEADERS)
         
         response = webhook_handler.handler(event, {})
         
@@ -434,56 +397,52 @@ class TestSubscriptionDeleted:
 class TestPaymentSucceeded:
     """Test handling of payment succeeded events"""
     
-    @patch('webhook_handler.stripe.Subscription.retrieve')
-    @patch('webhook_handler.stripe.Webhook.construct_event')
-    @patch('webhook_handler.get_secrets')
-    @patch('webhook_handler.table.scan')
-    @patch('webhook_handler.table.update_item')
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Webhook.construct_event', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.get_secrets')
+    @patch('lambdas.stripe_webhook.webhook_handler.table.query', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.table.update_item', spec=True)
     def test_payment_succeeded_maintains_unlimited(
         self,
         mock_update,
-        mock_scan,
+        mock_query,
         mock_get_secrets,
-        mock_construct_event,
-        mock_retrieve_sub
+        mock_construct_event
     ):
         """Test that payment success maintains unlimited plan cap"""
-        mock_scan.return_value = {
+        mock_query.return_value = {
             'Items': [{
                 'userId': 'user-123',
                 'stripeCustomerId': 'cus_test123'
             }]
         }
         
-        mock_retrieve_sub.return_value = {
-            'id': 'sub_test123',
-            'status': 'active',
-            'current_period_end': 1735689600  # Unix timestamp
-        }
-        
         mock_event = {
             'type': 'invoice.payment_succeeded',
             'data': {
                 'object': {
                     'id': 'in_test123',
                     'customer': 'cus_test123',
-                    'subscription': 'sub_test123'
+                    'subscription': 'sub_test123',
+                    'lines': {'data': [
+                        # Proration lines come first and carry their own period
+                        {'type': 'invoiceitem', 'period': {'start': 1699000000, 'end': 1700000000}},
+                        {'type': 'subscription', 'period': {'start': 1700000000, 'end': 1702592000}},
+                    ]}
                 }
             }
         }
         mock_construct_event.return_value = mock_event
         mock_get_secrets.return_value = {'stripe_webhook_secret': 'whsec_test'}
         
-        event = {
-            'body': json.dumps(mock_event),
-            'headers': {'stripe-signature': 'sig'}
-        }
+        event = LambdaEvent(_STUB_BODY, _SIG_HEADERS)
         
         response = webhook_handler.handler(event, {})
         
         assert response['statusCode'] == 200
         mock_update.assert_called_once()
         call_args = mock_update.call_args[1]
+        # Status comes from customer.subscription.updated (could be trialing)
+        assert ':status' not in call_args['ExpressionAttributeValues']
         
         # Payment success should maintain unlimited cap
         assert call_args['ExpressionAttributeValues'][':cap'] == -1, \
@@ -493,67 +452,48 @@ class TestPaymentSucceeded:
         # Verify period_end is int
         period_end = call_args['ExpressionAttributeValues'][':period_end']
         assert isinstance(period_end, int)
+        assert period_end == 1702592000
 
 
 class TestPaymentFailed:
     """Test handling of payment failed events"""
     
-    @patch('webhook_handler.stripe.Subscription.retrieve')
-    @patch('webhook_handler.stripe.Webhook.construct_event')
-    @patch('webhook_handler.get_secrets')
-    @patch('webhook_handler.table.scan')
-    @patch('webhook_handler.table.update_item')
-    @patch('webhook_handler.logger.warning')
-    def test_invoice_payment_failed_past_due(
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Webhook.construct_event', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.get_secrets')
+    @patch('lambdas.stripe_webhook.webhook_handler.table.query', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.table.update_item', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.logger.warning')
+    def test_invoice_payment_failed_leaves_status_to_subscription_update(
         self, 
         mock_logger,
         mock_update,
-        mock_scan,
+        mock_query,
         mock_get_secrets,
-        mock_construct_event,
-        mock_retrieve_sub
+        mock_construct_event
     ):
-        """Test that payment failures maintain access for past_due status"""
-        mock_scan.return_value = {
-            'Items': [{
-                'userId': 'user-123',
-                'stripeCustomerId': 'cus_test123'
-            }]
-        }
-        
-        mock_retrieve_sub.return_value = {
-            'id': 'sub_test123',
-            'status': 'past_due'
-        }
-        
+        """Test that payment failures don't guess the status the subscription ends up in"""
         mock_event = {
             'type': 'invoice.payment_failed',
             'data': {
                 'object': {
                     'id': 'in_test123',
                     'customer': 'cus_test123',
-                    'subscription': 'sub_test123'
+                    'subscription': 'sub_test123',
+                    'attempt_count': 4,
+                    'next_payment_attempt': None
                 }
             }
         }
         mock_construct_event.return_value = mock_event
         mock_get_secrets.return_value = {'stripe_webhook_secret': 'whsec_test'}
         
-        event = {
-            'body': json.dumps(mock_event),
-            'headers': {'stripe-signature': 'sig'}
-        }
+        event = LambdaEvent(_STUB_BODY, _SIG_HEADERS)
         
         response = webhook_handler.handler(event, {})
         
         assert response['statusCode'] == 200
-        mock_update.assert_called_once()
-        call_args = mock_update.call_args[1]
-        
-        # past_due should still be subscribed with unlimited
-        assert call_args['ExpressionAttributeValues'][':sub'] is True
-        assert call_args['ExpressionAttributeValues'][':cap'] == -1, \
-            "past_due status should maintain unlimited access"
+        # customer.subscription.updated records past_due/unpaid/canceled
+        mock_update.assert_not_called()
         
         # Verify warning was logged
         mock_logger.assert_called()
@@ -562,8 +502,8 @@ class TestPaymentFailed:
 class TestUnhandledEvents:
     """Test handling of unhandled event types"""
     
-    @patch('webhook_handler.stripe.Webhook.construct_event')
-    @patch('webhook_handler.logger.info')
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Webhook.construct_event', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.logger.info')
     def test_unhandled_event_returns_success(
         self, 
         mock_logger,
@@ -580,10 +520,7 @@ class TestUnhandledEvents:
         }
         mock_construct_event.return_value = mock_event
         
-        event = {
-            'body': json.dumps(mock_event),
-            'headers': {'stripe-signature': 'sig'}
-        }
+        event = LambdaEvent(_STUB_BODY, _SIG_HEADERS)
         
         response = webhook_handler.handler(event, {})
         
@@ -596,10 +533,10 @@ class TestUnhandledEvents:
 class TestMissingUserId:
     """Test handling of events without userId in metadata"""
     
-    @patch('webhook_handler.stripe.Subscription.retrieve')
-    @patch('webhook_handler.stripe.Webhook.construct_event')
-    @patch('webhook_handler.get_secrets')
-    @patch('webhook_handler.logger.error')
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Subscription.retrieve', autospec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Webhook.construct_event', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.get_secrets')
+    @patch('lambdas.stripe_webhook.webhook_handler.logger.error')
     def test_missing_user_id_logs_error(
         self,
         mock_logger,
@@ -608,21 +545,7 @@ class TestMissingUserId:
         mock_retrieve_sub
     ):
         """Test that missing userId is handled gracefully"""
-        mock_retrieve_sub.return_value = {
-            'id': 'sub_test123',
-            'status': 'active',
-            'current_period_end': 1735689600,
-            'cancel_at_period_end': False,
-            'items': {
-                'data': [{
-                    'price': {
-                        'recurring': {
-                            'interval': 'month'
-                        }
-                    }
-                }]
-            }
-        }
+        mock_retrieve_sub.return_value = sub_with()
         
         mock_event = {
             'type': 'checkout.session.completed',
@@ -638,10 +561,7 @@ class TestMissingUserId:
         mock_construct_event.return_value = mock_event
         mock_get_secrets.return_value = {'stripe_webhook_secret': 'whsec_test'}
         
-        event = {
-            'body': json.dumps(mock_event),
-            'headers': {'stripe-signature': 'sig'}
-        }
+        event = LambdaEvent(_STUB_BODY, _SIG_HEADERS)
         
         response = webhook_handler.handler(event, {})
         
@@ -651,6 +571,87 @@ class TestMissingUserId:
         mock_logger.assert_called()
 
 
+
+class TestUpdateSubscriptionFields:
+    """Test the shared subscription update writer"""
+    
+    @patch('lambdas.stripe_webhook.webhook_handler.table.update_item', spec=True)
+    def test_builds_single_update(self, mock_update):
+        """Test that None fields are skipped and reserved names are aliased"""
+        webhook_handler._update_subscription_fields(
+            'user-123',
+            '2026-01-01T00:00:00+00:00',
+            remove=('currentPeriodEnd',),
+            plan='free',
+            cap=5,
+            period_end=None
+        )
+        
+        mock_update.assert_called_once()
+        call_args = mock_update.call_args[1]
+        assert call_args['Key'] == {'userId': 'user-123'}
+        assert call_args['UpdateExpression'] == (
+            'SET #plan = :plan, plan_monthly_cap = :cap, updatedAt = :now REMOVE currentPeriodEnd'
+        )
+        assert call_args['ExpressionAttributeNames'] == {'#plan': 'plan'}
+        assert set(call_args['ExpressionAttributeValues']) == {':plan', ':cap', ':now'}
+        assert call_args['ExpressionAttributeValues'][':now'] == '2026-01-01T00:00:00+00:00'
+        assert 'ReturnValues' not in call_args
+
+
+class TestAsyncProcessing:
+    """Test queue-backed processing (handler enqueues, worker processes)"""
+    
+    @patch('lambdas.stripe_webhook.webhook_handler.sqs')
+    @patch('lambdas.stripe_webhook.webhook_handler.worker_queue_url', 'https://sqs.test/queue')
+    @patch('lambdas.stripe_webhook.webhook_handler.stripe.Webhook.construct_event', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.table.update_item', spec=True)
+    def test_handler_enqueues_verified_event(
+        self,
+        mock_update,
+        mock_construct_event,
+        mock_sqs
+    ):
+        """Test that handler queues the raw payload and skips processing"""
+        mock_construct_event.return_value = {
+            'type': 'customer.subscription.deleted',
+            'data': {'object': {'id': 'sub_test123', 'customer': 'cus_test123'}}
+        }
+        
+        response = webhook_handler.handler(LambdaEvent(_STUB_BODY, _SIG_HEADERS), {})
+        
+        assert response['statusCode'] == 200
+        mock_sqs.send_message.assert_called_once()
+        call_args = mock_sqs.send_message.call_args[1]
+        assert call_args['QueueUrl'] == 'https://sqs.test/queue'
+        assert call_args['MessageBody'] == _STUB_BODY
+        assert call_args['MessageAttributes']['event_type']['StringValue'] == 'customer.subscription.deleted'
+        mock_update.assert_not_called()
+    
+    @patch('lambdas.stripe_webhook.webhook_handler.table.query', spec=True)
+    @patch('lambdas.stripe_webhook.webhook_handler.table.update_item', spec=True)
+    def test_worker_processes_records_and_reports_failures(self, mock_update, mock_query):
+        """Test that the worker dispatches each record and reports bad ones"""
+        mock_query.return_value = {'Items': [{'userId': 'user-123'}]}
+        
+        deleted = json.dumps({
+            'type': 'customer.subscription.deleted',
+            'data': {'object': {'id': 'sub_test123', 'customer': 'cus_test123'}}
+        })
+        sqs_event = {
+            'Records': [
+                {'messageId': 'msg-1', 'body': deleted},
+                {'messageId': 'msg-2', 'body': 'not json'},
+            ]
+        }
+        
+        response = webhook_handler.worker_handler(sqs_event, {})
+        
+        mock_update.assert_called_once()
+        assert mock_update.call_args[1]['ExpressionAttributeValues'][':plan'] == 'free'
+        assert response == {'batchItemFailures': [{'itemIdentifier': 'msg-2'}]}
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
 
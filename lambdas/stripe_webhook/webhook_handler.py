@@ -9,7 +9,7 @@ import boto3
 import stripe
 import logging
 from datetime import datetime, timezone
-from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.conditions import Key
 
 # Add Lambda layer path for shared code
 sys.path.append('/opt/python')
@@ -21,12 +21,8 @@ except ImportError:
     # Fallback for local testing
     from lambdas.shared.secrets_helper import get_secret, get_secrets
 
-# Import SMS notifications helper
-try:
-    from sms_notifications import send_subscription_confirmation_sms, send_cancellation_sms
-except ImportError:
-    # Fallback for local testing
-    from lambdas.shared.sms_notifications import send_subscription_confirmation_sms, send_cancellation_sms
+# SMS notifications helper (and Twilio) is imported lazily by the handlers
+# that send SMS, so payment_* cold starts don't pay for it
 
 # Setup logging
 logger = logging.getLogger()
@@ -35,6 +31,10 @@ logger.setLevel(logging.INFO)
 # Initialize Stripe with key from Secrets Manager
 stripe.api_key = get_secret('stripe_secret_key')
 
+# Pin one requests-backed client so its keep-alive session (and TLS handshake)
+# is reused across warm invocations instead of being rebuilt lazily
+stripe.default_http_client = stripe.RequestsClient(timeout=5)
+
 # DynamoDB setup
 dynamodb = boto3.resource("dynamodb")
 env = os.environ.get("ENVIRONMENT", "dev")
@@ -43,6 +43,26 @@ table_name = f"{env}-{project_name}-users"
 table = dynamodb.Table(table_name)
 promo_codes_table = dynamodb.Table(f"{env}-{project_name}-promo-codes")
 
+# Optional SQS queue for async processing. When set, handler() only verifies
+# the signature and enqueues the event; worker_handler() does the processing.
+worker_queue_url = os.environ.get("WORKER_QUEUE_URL")
+sqs = boto3.client("sqs") if worker_queue_url else None
+
+# GSI on the users table keyed by stripeCustomerId (see terraform/modules/dynamodb)
+STRIPE_CUSTOMER_INDEX = "stripeCustomerId-index"
+
+# Webhook signing secret, resolved on first use and reused while the container is warm
+_endpoint_secret = None
+
+
+def _get_endpoint_secret():
+    """Return the Stripe webhook signing secret, caching it at module scope"""
+    global _endpoint_secret
+    if _endpoint_secret is None:
+        # Note: This will be set manually after webhook endpoint is created
+        _endpoint_secret = get_secrets().get("stripe_webhook_secret")
+    return _endpoint_secret
+
 
 def handler(event, context):
     """Handle Stripe webhook events"""
@@ -56,10 +76,8 @@ def handler(event, context):
         logger.error("No Stripe signature header found")
         return {"statusCode": 400, "body": "No signature header"}
     
-    # Get webhook secret from Secrets Manager
-    # Note: This will be set manually after webhook endpoint is created
-    secrets = get_secrets()
-    endpoint_secret = secrets.get("stripe_webhook_secret")
+    # Get webhook secret from Secrets Manager (cached across warm invocations)
+    endpoint_secret = _get_endpoint_secret()
     
     if not endpoint_secret:
         logger.error("Stripe webhook secret not configured in Secrets Manager")
@@ -78,27 +96,28 @@ def handler(event, context):
         return {"statusCode": 400, "body": "Invalid signature"}
     
     event_type = webhook_event["type"]
-    data = webhook_event["data"]["object"]
+    
+    # Acknowledge quickly and let the worker Lambda do the Stripe/DynamoDB/SMS work
+    if worker_queue_url:
+        try:
+            sqs.send_message(
+                QueueUrl=worker_queue_url,
+                MessageBody=payload,
+                MessageAttributes={
+                    "event_type": {"DataType": "String", "StringValue": event_type}
+                }
+            )
+            logger.info(f"Queued webhook event: {event_type}")
+            return {"statusCode": 200, "body": "Queued"}
+        except Exception as e:
+            logger.error(f"Error queueing webhook: {e}", exc_info=True)
+            # Return 500 so Stripe retries
+            return {"statusCode": 500, "body": f"Queueing failed: {str(e)}"}
     
     logger.info(f"Processing webhook event: {event_type}")
     
-    # Route to appropriate handler
     try:
-        if event_type == "checkout.session.completed":
-            handle_checkout_completed(data)
-        elif event_type == "customer.subscription.created":
-            handle_subscription_created(data)
-        elif event_type == "customer.subscription.updated":
-            handle_subscription_updated(data)
-        elif event_type == "customer.subscription.deleted":
-            handle_subscription_deleted(data)
-        elif event_type == "invoice.payment_succeeded":
-            handle_payment_succeeded(data)
-        elif event_type == "invoice.payment_failed":
-            handle_payment_failed(data)
-        else:
-            logger.info(f"Unhandled event type: {event_type}")
-        
+        _dispatch_event(event_type, webhook_event["data"]["object"])
         return {"statusCode": 200, "body": "Success"}
         
     except Exception as e:
@@ -107,7 +126,49 @@ def handler(event, context):
         return {"statusCode": 500, "body": f"Processing failed: {str(e)}"}
 
 
-def handle_checkout_completed(session):
+def worker_handler(event, context):
+    """Process Stripe events queued by handler() (SQS trigger).
+    
+    Messages carry the raw webhook body, which handler() has already
+    verified. Failed records are reported individually so SQS only
+    redelivers those (ReportBatchItemFailures).
+    """
+    failures = []
+    for record in event.get("Records", []):
+        try:
+            webhook_event = json.loads(record["body"])
+            event_type = webhook_event["type"]
+            logger.info(f"Processing queued webhook event: {event_type}")
+            _dispatch_event(event_type, webhook_event["data"]["object"])
+        except Exception as e:
+            logger.error(f"Error processing queued webhook {record.get('messageId')}: {e}", exc_info=True)
+            failures.append({"itemIdentifier": record["messageId"]})
+    
+    return {"batchItemFailures": failures}
+
+
+def _dispatch_event(event_type, data):
+    """Route a verified Stripe event to the appropriate handler"""
+    # One timestamp per event, so every write it causes shares the same updatedAt
+    now = datetime.now(timezone.utc).isoformat()
+    
+    if event_type == "checkout.session.completed":
+        handle_checkout_completed(data, now)
+    elif event_type == "customer.subscription.created":
+        handle_subscription_created(data)
+    elif event_type == "customer.subscription.updated":
+        handle_subscription_updated(data, now)
+    elif event_type == "customer.subscription.deleted":
+        handle_subscription_deleted(data, now)
+    elif event_type == "invoice.payment_succeeded":
+        handle_payment_succeeded(data, now)
+    elif event_type == "invoice.payment_failed":
+        handle_payment_failed(data, now)
+    else:
+        logger.info(f"Unhandled event type: {event_type}")
+
+
+def handle_checkout_completed(session, now):
     """User completed checkout - subscription is being set up"""
     customer_id = session["customer"]
     subscription_id = session.get("subscription")
@@ -130,8 +191,9 @@ def handle_checkout_completed(session):
         expand=['items.data.price']
     )
     
-    # LOG THE ENTIRE SUBSCRIPTION OBJECT
-    logger.info(f"RAW SUBSCRIPTION OBJECT: {json.dumps(dict(subscription), default=str, indent=2)}")
+    # Full subscription dump is large; %s defers str() (Stripe's own JSON repr)
+    # until a DEBUG record is actually emitted
+    logger.debug("RAW SUBSCRIPTION: %s", subscription)
     
     # Access plan information
     plan_interval = subscription['items']['data'][0]['price']['recurring']['interval']
@@ -141,63 +203,41 @@ def handle_checkout_completed(session):
     period_end = subscription.get('current_period_end')
     logger.info(f"Got current_period_end from subscription: {period_end}")
     
-    update_expression = """
-        SET stripeCustomerId = :cid,
-            stripeSubscriptionId = :sid,
-            isSubscribed = :sub,
-            #plan = :plan,
-            plan_monthly_cap = :cap,
-            subscriptionStatus = :status,
-            cancelAtPeriodEnd = :cancel,
-            updatedAt = :now
-    """
-    
-    expression_values = {
-        ":cid": customer_id,
-        ":sid": subscription_id,
-        ":sub": True,
-        ":plan": plan,
-        ":cap": -1,  # Unlimited for paid plans
-        ":status": subscription['status'],
-        ":cancel": subscription.get('cancel_at_period_end', False) or subscription.get('cancel_at') is not None,
-        ":now": datetime.now(timezone.utc).isoformat()
-    }
-    
-    # Only add currentPeriodEnd if we have it
-    if period_end:
-        update_expression += ", currentPeriodEnd = :period_end"
-        expression_values[":period_end"] = int(period_end)
-    
-    # Store promo code on user record for attribution
-    if promo_code:
-        update_expression += ", promoCode = :promo"
-        expression_values[":promo"] = promo_code
-    
-    table.update_item(
-        Key={"userId": user_id},
-        UpdateExpression=update_expression,
-        ExpressionAttributeNames={
-            "#plan": "plan"
-        },
-        ExpressionAttributeValues=expression_values
+    # ALL_NEW returns the updated user record, so the phone number for the
+    # confirmation SMS comes back without a second read
+    update_response = _update_subscription_fields(
+        user_id,
+        now,
+        return_values="ALL_NEW",
+        cid=customer_id,
+        sid=subscription_id,
+        sub=True,
+        plan=plan,
+        cap=-1,  # Unlimited for paid plans
+        status=subscription['status'],
+        cancel=subscription.get('cancel_at_period_end', False) or subscription.get('cancel_at') is not None,
+        period_end=int(period_end) if period_end else None,
+        promo=promo_code,  # Stored on the user record for attribution
     )
     
     logger.info(f"Updated user {user_id} with subscription {plan}, period_end: {period_end}, promoCode: {promo_code}")
     
     # Track promo code usage in promo-codes table
     if promo_code:
-        _track_promo_code_usage(promo_code, user_id)
+        _track_promo_code_usage(promo_code, user_id, now)
     
     # Send subscription confirmation SMS if user has a phone number
     try:
-        user_response = table.get_item(Key={"userId": user_id})
-        if "Item" in user_response:
-            phone_number = user_response["Item"].get("phoneNumber")
-            if phone_number:
-                logger.info(f"Sending subscription confirmation SMS to {phone_number}")
-                send_subscription_confirmation_sms(phone_number)
-            else:
-                logger.info(f"User {user_id} has no phone number registered, skipping SMS")
+        phone_number = update_response.get("Attributes", {}).get("phoneNumber")
+        if phone_number:
+            logger.info(f"Sending subscription confirmation SMS to {phone_number}")
+            try:
+                from sms_notifications import send_subscription_confirmation_sms
+            except ImportError:
+                from lambdas.shared.sms_notifications import send_subscription_confirmation_sms
+            send_subscription_confirmation_sms(phone_number)
+        else:
+            logger.info(f"User {user_id} has no phone number registered, skipping SMS")
     except Exception as sms_error:
         logger.error(f"Failed to send subscription confirmation SMS for user {user_id}: {str(sms_error)}", exc_info=True)
 
@@ -229,7 +269,7 @@ def _extract_promo_code(session):
     return None
 
 
-def _track_promo_code_usage(code, user_id):
+def _track_promo_code_usage(code, user_id, now):
     """Atomically increment usage counter on the promo-codes table.
     
     Creates the record if it doesn't exist yet (first redemption before
@@ -245,7 +285,7 @@ def _track_promo_code_usage(code, user_id):
             """,
             ExpressionAttributeValues={
                 ":inc": 1,
-                ":now": datetime.now(timezone.utc).isoformat(),
+                ":now": now,
                 ":uid": {user_id}
             }
         )
@@ -254,6 +294,68 @@ def _track_promo_code_usage(code, user_id):
         logger.error(f"Failed to track promo code usage for '{code}': {e}", exc_info=True)
 
 
+def _find_user_by_customer(customer_id):
+    """Look up the user for a Stripe customer via the stripeCustomerId GSI.
+    
+    Queries the index instead of scanning the users table, so the cost is
+    one item read regardless of table size. Only userId and phoneNumber are
+    projected onto the index. Returns None if no user is linked.
+    """
+    response = table.query(
+        IndexName=STRIPE_CUSTOMER_INDEX,
+        KeyConditionExpression=Key("stripeCustomerId").eq(customer_id),
+        ProjectionExpression="userId, phoneNumber",
+        Limit=1
+    )
+    items = response.get("Items")
+    return items[0] if items else None
+
+
+# Short field name -> users table attribute. The short name doubles as the
+# expression placeholder (":cap"), names starting with "#" are reserved words.
+_SUBSCRIPTION_ATTRIBUTES = {
+    "cid": "stripeCustomerId",
+    "sid": "stripeSubscriptionId",
+    "sub": "isSubscribed",
+    "plan": "#plan",
+    "cap": "plan_monthly_cap",
+    "status": "subscriptionStatus",
+    "cancel": "cancelAtPeriodEnd",
+    "period_end": "currentPeriodEnd",
+    "promo": "promoCode",
+}
+_RESERVED_ATTRIBUTE_NAMES = {"#plan": "plan"}
+
+
+def _update_subscription_fields(user_id, now, remove=(), return_values=None, **fields):
+    """SET the given subscription fields (plus updatedAt=now) on a user in one update_item.
+    
+    Fields whose value is None are skipped. Attributes named in remove are
+    dropped in the same call. Returns the update_item response.
+    """
+    values = {f":{k}": v for k, v in fields.items() if v is not None}
+    values[":now"] = now
+    
+    assignments = [f"{_SUBSCRIPTION_ATTRIBUTES[p[1:]]} = {p}" for p in values if p != ":now"]
+    assignments.append("updatedAt = :now")
+    update_expression = "SET " + ", ".join(assignments)
+    if remove:
+        update_expression += " REMOVE " + ", ".join(remove)
+    
+    kwargs = {
+        "Key": {"userId": user_id},
+        "UpdateExpression": update_expression,
+        "ExpressionAttributeValues": values,
+    }
+    names = {n: a for n, a in _RESERVED_ATTRIBUTE_NAMES.items() if n in update_expression}
+    if names:
+        kwargs["ExpressionAttributeNames"] = names
+    if return_values:
+        kwargs["ReturnValues"] = return_values
+    
+    return table.update_item(**kwargs)
+
+
 def handle_subscription_created(subscription):
     """Subscription was created (usually same as checkout.completed)"""
     logger.info(f"Subscription created: {subscription['id']}")
@@ -261,12 +363,11 @@ def handle_subscription_created(subscription):
     # But we can update here too for safety
 
 
-def handle_subscription_updated(subscription):
+def handle_subscription_updated(subscription, now):
     """Subscription was modified (plan change, cancellation scheduled, etc)"""
-    import json
-    
-    # LOG THE ENTIRE SUBSCRIPTION OBJECT FOR UPDATE
-    logger.info(f"RAW SUBSCRIPTION UPDATE OBJECT: {json.dumps(dict(subscription), default=str, indent=2)}")
+    # Full subscription dump is large; %s defers str() (Stripe's own JSON repr)
+    # until a DEBUG record is actually emitted
+    logger.debug("RAW SUBSCRIPTION UPDATE: %s", subscription)
     
     customer_id = subscription["customer"]
     
@@ -275,15 +376,11 @@ def handle_subscription_updated(subscription):
     logger.info(f"status: {subscription.get('status')}")
     
     # Find user by customer ID
-    response = table.scan(
-        FilterExpression=Attr("stripeCustomerId").eq(customer_id)
-    )
-    
-    if not response.get("Items"):
+    user = _find_user_by_customer(customer_id)
+    if not user:
         logger.warning(f"No user found for customer {customer_id}")
         return
     
-    user = response["Items"][0]
     logger.info(f"Found user: {user['userId']}, cancel_at={subscription.get('cancel_at')}, cancel_at_period_end={subscription.get('cancel_at_period_end')}")
     
     plan_interval = subscription["items"]["data"][0]["price"]["recurring"]["interval"]
@@ -299,83 +396,43 @@ def handle_subscription_updated(subscription):
     is_canceling = subscription.get('cancel_at_period_end', False) or subscription.get('cancel_at') is not None
     logger.info(f"Computed is_canceling: {is_canceling}")
     
-    # Build update expression dynamically
-    update_expression = """
-        SET subscriptionStatus = :status,
-            #plan = :plan,
-            plan_monthly_cap = :cap,
-            cancelAtPeriodEnd = :cancel,
-            isSubscribed = :sub,
-            updatedAt = :now
-    """
-    
-    expression_values = {
-        ":status": subscription["status"],
-        ":plan": plan,
-        ":cap": -1 if subscription["status"] in ["active", "trialing"] else 5,
-        ":cancel": is_canceling,  # Use computed is_canceling
-        ":sub": subscription["status"] in ["active", "trialing"],
-        ":now": datetime.now(timezone.utc).isoformat()
-    }
-    
-    # Only add currentPeriodEnd if we have it
-    if period_end:
-        update_expression += ", currentPeriodEnd = :period_end"
-        expression_values[":period_end"] = int(period_end)
-    
     # Update subscription details
-    table.update_item(
-        Key={"userId": user["userId"]},
-        UpdateExpression=update_expression,
-        ExpressionAttributeNames={
-            "#plan": "plan"
-        },
-        ExpressionAttributeValues=expression_values
+    _update_subscription_fields(
+        user["userId"],
+        now,
+        status=subscription["status"],
+        plan=plan,
+        cap=-1 if subscription["status"] in ["active", "trialing"] else 5,
+        cancel=is_canceling,  # Use computed is_canceling
+        sub=subscription["status"] in ["active", "trialing"],
+        period_end=int(period_end) if period_end else None,
     )
     
     logger.info(f"Updated subscription for user {user['userId']}: {subscription['status']}, cancel_at_period_end: {subscription.get('cancel_at_period_end', False)}")
 
 
-def handle_subscription_deleted(subscription):
+def handle_subscription_deleted(subscription, now):
     """Subscription was canceled and has now ended"""
     customer_id = subscription["customer"]
     
     logger.info(f"Subscription deleted for customer {customer_id}")
     
-    response = table.scan(
-        FilterExpression=Attr("stripeCustomerId").eq(customer_id)
-    )
-    
-    if not response.get("Items"):
+    user = _find_user_by_customer(customer_id)
+    if not user:
         logger.warning(f"No user found for customer {customer_id}")
         return
     
-    user = response["Items"][0]
-    
     # Mark user as unsubscribed, revert to free plan with message cap
     # REMOVE currentPeriodEnd to avoid showing stale billing dates
-    table.update_item(
-        Key={"userId": user["userId"]},
-        UpdateExpression="""
-            SET isSubscribed = :sub,
-                #plan = :plan,
-                plan_monthly_cap = :cap,
-                subscriptionStatus = :status,
-                cancelAtPeriodEnd = :cancel,
-                updatedAt = :now
-            REMOVE currentPeriodEnd
-        """,
-        ExpressionAttributeNames={
-            "#plan": "plan"
-        },
-        ExpressionAttributeValues={
-            ":sub": False,
-            ":plan": "free",
-            ":cap": 5,  # Revert to free tier limit (5 messages/month)
-            ":status": "canceled",
-            ":cancel": False,  # Clear the cancel flag since subscription has ended
-            ":now": datetime.now(timezone.utc).isoformat()
-        }
+    _update_subscription_fields(
+        user["userId"],
+        now,
+        remove=("currentPeriodEnd",),
+        sub=False,
+        plan="free",
+        cap=5,  # Revert to free tier limit (5 messages/month)
+        status="canceled",
+        cancel=False,  # Clear the cancel flag since subscription has ended
     )
     
     logger.info(f"Reverted user {user['userId']} to free plan after subscription ended")
@@ -385,6 +442,10 @@ def handle_subscription_deleted(subscription):
         phone_number = user.get("phoneNumber")
         if phone_number:
             logger.info(f"Sending cancellation SMS to {phone_number}")
+            try:
+                from sms_notifications import send_cancellation_sms
+            except ImportError:
+                from lambdas.shared.sms_notifications import send_cancellation_sms
             send_cancellation_sms(phone_number)
         else:
             logger.info(f"User {user['userId']} has no phone number registered, skipping SMS")
@@ -393,8 +454,8 @@ def handle_subscription_deleted(subscription):
         logger.error(f"Failed to send cancellation SMS for user {user['userId']}: {str(sms_error)}", exc_info=True)
 
 
-def handle_payment_failed(invoice):
-    """Payment failed - mark subscription at risk"""
+def handle_payment_failed(invoice, now):
+    """Payment failed - logged only; the status change arrives as customer.subscription.updated"""
     customer_id = invoice["customer"]
     subscription_id = invoice.get("subscription")
     
@@ -402,41 +463,17 @@ def handle_payment_failed(invoice):
         logger.info("Payment failed for non-subscription invoice")
         return
     
-    logger.warning(f"Payment failed for customer {customer_id}")
-    
-    response = table.scan(
-        FilterExpression=Attr("stripeCustomerId").eq(customer_id)
-    )
-    
-    if not response.get("Items"):
-        logger.warning(f"No user found for customer {customer_id}")
-        return
-    
-    user = response["Items"][0]
-    
-    # Get current subscription status
-    subscription = stripe.Subscription.retrieve(subscription_id)
-    
-    table.update_item(
-        Key={"userId": user["userId"]},
-        UpdateExpression="""
-            SET subscriptionStatus = :status,
-                isSubscribed = :sub,
-                plan_monthly_cap = :cap,
-                updatedAt = :now
-        """,
-        ExpressionAttributeValues={
-            ":status": subscription['status'],  # Will be "past_due" or "unpaid"
-            ":sub": subscription['status'] == "past_due",  # Still subscribed if past_due
-            ":cap": -1 if subscription['status'] == "past_due" else 5,  # Keep unlimited if past_due
-            ":now": datetime.now(timezone.utc).isoformat()
-        }
+    # Whether a failed payment leaves the subscription past_due, unpaid or
+    # canceled depends on the account's retry settings, and the invoice doesn't
+    # say. Stripe follows up with customer.subscription.updated carrying the
+    # real status, which handle_subscription_updated records
+    logger.warning(
+        f"Payment failed for customer {customer_id} on subscription {subscription_id} "
+        f"(attempt {invoice.get('attempt_count')}, next attempt {invoice.get('next_payment_attempt')})"
     )
-    
-    logger.warning(f"Marked user {user['userId']} subscription as {subscription['status']}")
 
 
-def handle_payment_succeeded(invoice):
+def handle_payment_succeeded(invoice, now):
     """Payment succeeded - renewal confirmed"""
     customer_id = invoice["customer"]
     subscription_id = invoice.get("subscription")
@@ -447,45 +484,27 @@ def handle_payment_succeeded(invoice):
     
     logger.info(f"Payment succeeded for customer {customer_id}")
     
-    response = table.scan(
-        FilterExpression=Attr("stripeCustomerId").eq(customer_id)
-    )
-    
-    if not response.get("Items"):
+    user = _find_user_by_customer(customer_id)
+    if not user:
         logger.warning(f"No user found for customer {customer_id}")
         return
     
-    user = response["Items"][0]
-    subscription = stripe.Subscription.retrieve(subscription_id)
-    
-    # Get current_period_end from subscription object (not from items)
-    period_end = subscription.get('current_period_end')
+    # The subscription line carries the billed period, so no subscription lookup
+    # is needed; other lines (prorations, one-off items) can have other periods
+    lines = invoice.get("lines", {}).get("data", [])
+    subscription_line = next((line for line in lines if line.get("type") == "subscription"), None)
+    period_end = subscription_line.get("period", {}).get("end") if subscription_line else None
     if not period_end:
-        logger.warning(f"No current_period_end in subscription {subscription_id}")
-    
-    update_expression = """
-        SET subscriptionStatus = :status,
-            isSubscribed = :sub,
-            plan_monthly_cap = :cap,
-            updatedAt = :now
-    """
-    
-    expression_values = {
-        ":status": subscription['status'],
-        ":sub": True,
-        ":cap": -1,  # Unlimited for paid plans
-        ":now": datetime.now(timezone.utc).isoformat()
-    }
-    
-    # Only add currentPeriodEnd if we have it
-    if period_end:
-        update_expression += ", currentPeriodEnd = :period_end"
-        expression_values[":period_end"] = int(period_end)
-    
-    table.update_item(
-        Key={"userId": user["userId"]},
-        UpdateExpression=update_expression,
-        ExpressionAttributeValues=expression_values
+        logger.warning(f"No period end on invoice {invoice.get('id')} for subscription {subscription_id}")
+    
+    _update_subscription_fields(
+        user["userId"],
+        now,
+        # Status is left to customer.subscription.updated: a paid invoice can
+        # belong to a trialing subscription as well as an active one
+        sub=True,
+        cap=-1,  # Unlimited for paid plans
+        period_end=int(period_end) if period_end else None,
     )
     
     logger.info(f"Confirmed subscription renewal for user {user['userId']}")
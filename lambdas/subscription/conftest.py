@@ -0,0 +1,82 @@
+"""
+Shared fixtures for the Stripe subscription handler tests
+"""
+import os
+import types
+
+import pytest
+
+# Environment the handler reads at import time
+os.environ['ENVIRONMENT'] = 'test'
+os.environ['PROJECT_NAME'] = 'versiful'
+os.environ['SECRET_ARN'] = 'arn:aws:secretsmanager:us-east-1:123456789012:secret:test-secret'
+os.environ['FRONTEND_DOMAIN'] = 'test.versiful.io'
+
+
+class _StripeError(Exception):
+    def __init__(self, message=None, param=None, *args, **kwargs):
+        super().__init__(message)
+        self.param = param
+
+
+def _stripe_stub():
+    """Stand-in for the Stripe SDK covering the calls the handler makes.
+    
+    Importing the real SDK is the slowest part of loading the handler; the
+    tests patch every API method they exercise anyway.
+    """
+    def _api(*names):
+        return types.SimpleNamespace(**{name: lambda *a, **k: None for name in names})
+
+    stub = types.ModuleType("stripe")
+    stub.api_key = None
+    stub.error = types.SimpleNamespace(
+        StripeError=_StripeError,
+        RateLimitError=type("RateLimitError", (_StripeError,), {}),
+        APIConnectionError=type("APIConnectionError", (_StripeError,), {}),
+        InvalidRequestError=type("InvalidRequestError", (_StripeError,), {}),
+    )
+    stub.Customer = _api("create", "list", "delete")
+    stub.Subscription = _api("list")
+    stub.checkout = types.SimpleNamespace(Session=_api("create"))
+    stub.billing_portal = types.SimpleNamespace(Session=_api("create"))
+    return stub
+
+
+@pytest.fixture(scope="session")
+def subscription_handler():
+    """Import the handler once per session.
+    
+    Secrets are only read when Stripe is first used, so nothing is patched at
+    import time. fake_stripe_key replaces the get_secret the handler bound,
+    which may come from the top-level secrets_helper when lambdas/shared is
+    on sys.path.
+    """
+    from lambdas.subscription import subscription_handler as module
+    return module
+
+
+@pytest.fixture(autouse=True)
+def clear_user_cache(subscription_handler):
+    """Keep cached user records from leaking between tests"""
+    subscription_handler._USER_CACHE.clear()
+    yield
+    subscription_handler._USER_CACHE.clear()
+
+
+@pytest.fixture(autouse=True)
+def fake_stripe_key(subscription_handler, monkeypatch):
+    """Stripe is keyed lazily, so stub the secret for every test"""
+    monkeypatch.setattr(subscription_handler, 'get_secret', lambda name: 'sk_test_fake_key')
+
+
+@pytest.fixture(autouse=True)
+def stripe_stub(subscription_handler, monkeypatch):
+    """Load the handler's lazy Stripe global with the stub instead of the SDK.
+    
+    Set on the handler rather than in sys.modules, so other test modules in
+    the same worker still get the real SDK.
+    """
+    stub = _stripe_stub()
+    monkeypatch.setattr(subscription_handler, 'stripe', stub)
+    return stub
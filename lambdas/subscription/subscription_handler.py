@@ -6,12 +6,29 @@ import json
 import os
 import sys
 import boto3
-import stripe
 import logging
+import random
+import time
+import uuid
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
 # Add Lambda layer path for shared code
 sys.path.append('/opt/python')
 
+# orjson (from the shared layer) is several times faster than stdlib json;
+# fall back to json if the layer doesn't provide it
+try:
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj).decode()
+
+    _loads = orjson.loads
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
+
 # Import secrets helper
 try:
     from secrets_helper import get_secret, get_secrets
@@ -23,96 +40,230 @@ except ImportError:
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize Stripe with key from Secrets Manager
-stripe.api_key = get_secret('stripe_secret_key')
+# Stripe SDK is imported and keyed on first use (see _ensure_stripe), so cold
+# starts that never call Stripe skip the import and the Secrets Manager read
+stripe = None
+_stripe_session = None
+STRIPE_API_BASE = "https://api.stripe.com/v1"
+
+
+def _ensure_stripe():
+    """Import the Stripe SDK and set its API key from Secrets Manager on first use"""
+    global stripe, _stripe_session
+    if stripe is None:
+        import requests
+        import stripe as _stripe
+        _stripe.api_key = get_secret('stripe_secret_key')
+        # One pooled keep-alive session for every Stripe call in this container
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10)
+        session.mount("https://", adapter)
+        _stripe.default_http_client = _stripe.RequestsClient(timeout=10, session=session)
+        _stripe_session = session
+        stripe = _stripe
+    return stripe
+
+
+def _prewarm_stripe_connection():
+    """Open a pooled TLS connection to Stripe so the next API call skips the handshake"""
+    try:
+        _stripe_session.head(STRIPE_API_BASE, timeout=1)
+    except Exception as e:
+        logger.warning("Could not pre-warm Stripe connection: %s", e)
+
+
+STRIPE_MAX_ATTEMPTS = 4
+
+
+def _stripe_call(fn, *args, **kwargs):
+    """Call a Stripe API method, retrying rate limits and connection errors.
+    
+    Backs off 0.1s, 0.2s, 0.4s (plus jitter) between attempts, which stays
+    well inside API Gateway's 29s limit. The last error is re-raised.
+    """
+    for attempt in range(STRIPE_MAX_ATTEMPTS):
+        try:
+            return fn(*args, **kwargs)
+        except (stripe.error.RateLimitError, stripe.error.APIConnectionError) as e:
+            if attempt == STRIPE_MAX_ATTEMPTS - 1:
+                raise
+            delay = (2 ** attempt) * 0.1 + random.random() * 0.05
+            logger.warning("Stripe %s, retrying in %.2fs: %s", type(e).__name__, delay, e)
+            time.sleep(delay)
+
+# DynamoDB setup - short timeouts and adaptive retries, with keep-alive so
+# warm invocations reuse the pooled connection
+boto_config = Config(
+    retries={"mode": "adaptive", "max_attempts": 3},
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    connect_timeout=1,
+    read_timeout=3
+)
+dynamodb = boto3.resource("dynamodb", config=boto_config)
+# Low-level client for the hot user read; skips the resource layer's
+# TypeDeserializer for the two string attributes we need
+ddb_client = boto3.client("dynamodb", config=boto_config)
 
-# DynamoDB setup
-dynamodb = boto3.resource("dynamodb")
 env = os.environ.get("ENVIRONMENT", "dev")
 project_name = os.environ.get("PROJECT_NAME", "versiful")
 table_name = f"{env}-{project_name}-users"
 table = dynamodb.Table(table_name)
 
+# Frontend redirect defaults and response headers are fixed per container
+frontend_domain = os.environ.get("FRONTEND_DOMAIN", f"{env}.versiful.io")
+DEFAULT_SUCCESS_URL = f"https://{frontend_domain}/settings?session_id={{CHECKOUT_SESSION_ID}}"
+DEFAULT_CANCEL_URL = f"https://{frontend_domain}/subscription"
+DEFAULT_RETURN_URL = f"https://{frontend_domain}/settings"
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Fixed error responses, serialized once and returned as-is
+NOT_FOUND_RESPONSE = {"statusCode": 404, "body": _dumps({"error": "Not found"})}
+MISSING_PRICE_ID_RESPONSE = {"statusCode": 400, "body": _dumps({"error": "priceId is required"})}
+NO_EMAIL_RESPONSE = {"statusCode": 400, "body": _dumps({"error": "User email not found"})}
+NO_SUBSCRIPTION_RESPONSE = {"statusCode": 400, "body": _dumps({"error": "No active subscription found"})}
+
+# Short-lived per-container cache of user records: userId -> (item, expiry)
+_USER_CACHE = {}
+_USER_TTL = 30  # seconds
+_USER_CACHE_MAX = 1024
+
+
+def _get_user(user_id):
+    """Read just the user's email and stripeCustomerId (None when missing)"""
+    response = ddb_client.get_item(
+        TableName=table_name,
+        Key={"userId": {"S": user_id}},
+        ProjectionExpression="email, stripeCustomerId"
+    )
+    item = response.get("Item", {})
+    return {
+        "email": item.get("email", {}).get("S"),
+        "stripeCustomerId": item.get("stripeCustomerId", {}).get("S"),
+    }
+
+
+def _get_user_cached(user_id):
+    """Return the user's DynamoDB item, reusing a recent read on warm containers"""
+    cached = _USER_CACHE.get(user_id)
+    if cached and time.monotonic() < cached[1]:
+        return cached[0]
+    
+    user = _get_user(user_id)
+    if len(_USER_CACHE) >= _USER_CACHE_MAX:
+        _USER_CACHE.clear()
+    _USER_CACHE[user_id] = (user, time.monotonic() + _USER_TTL)
+    return user
+
+
+def _adopt_existing_customer(user_id, duplicate_id):
+    """Return the customer ID another request already saved, deleting our duplicate"""
+    response = ddb_client.get_item(
+        TableName=table_name,
+        Key={"userId": {"S": user_id}},
+        ProjectionExpression="stripeCustomerId",
+        ConsistentRead=True
+    )
+    existing_id = response["Item"]["stripeCustomerId"]["S"]
+    logger.warning(
+        "User %s already has customer %s, deleting duplicate %s",
+        user_id, existing_id, duplicate_id
+    )
+    try:
+        stripe.Customer.delete(duplicate_id)
+    except Exception as e:
+        # Best effort; an orphaned customer with no subscription is harmless
+        logger.warning("Could not delete duplicate customer %s: %s", duplicate_id, e)
+    return existing_id
+
 
 def handler(event, context):
     """Main handler routes to sub-handlers"""
-    logger.info(f"Received event: {json.dumps(event)}")
+    # Scheduled warmer ping: load Stripe and open its connection so real
+    # requests find both ready, then stop
+    if event.get("warmer") or event.get("source") == "aws.events":
+        try:
+            _ensure_stripe()
+        except Exception as e:
+            logger.warning("Warmer could not initialise Stripe: %s", e)
+        else:
+            _prewarm_stripe_connection()
+        return {"statusCode": 200, "body": "warm"}
     
     path = event.get("path", "")
     method = event.get("httpMethod", "")
     
+    logger.info("Request %s %s", method, path)
+    # Full API Gateway event is several KB; only serialize it when debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("event=%s", _dumps(event))
+    
+    # API Gateway only sends /subscription/* here, so the last segment is enough
+    route = _ROUTES.get((method, path.rpartition("/")[2]))
+    
     try:
-        if method == "POST" and path.endswith("/subscription/checkout"):
-            return create_checkout_session(event, context)
-        elif method == "POST" and path.endswith("/subscription/portal"):
-            return create_portal_session(event, context)
-        elif method == "GET" and path.endswith("/subscription/prices"):
-            return get_prices(event, context)
+        if route:
+            return route(event, context)
         else:
-            return {
-                "statusCode": 404,
-                "body": json.dumps({"error": "Not found"})
-            }
+            return NOT_FOUND_RESPONSE
     except Exception as e:
-        logger.error(f"Error processing request: {e}", exc_info=True)
+        logger.error("Error processing request: %s", e, exc_info=True)
         return {
             "statusCode": 500,
-            "body": json.dumps({"error": str(e)})
+            "body": _dumps({"error": str(e)})
         }
 
 
 def create_checkout_session(event, context):
     """Create a Stripe checkout session for monthly or annual plan"""
     try:
+        _ensure_stripe()
         user_id = event["requestContext"]["authorizer"]["userId"]
-        body = json.loads(event.get("body", "{}"))
+        body = _loads(event.get("body") or "{}")
         price_id = body.get("priceId")
         success_url = body.get("successUrl")  # Allow frontend to specify URLs
         cancel_url = body.get("cancelUrl")
         
         if not price_id:
-            return {
-                "statusCode": 400,
-                "body": json.dumps({"error": "priceId is required"})
-            }
-        
-        # Get frontend domain from environment, or use provided URLs
-        frontend_domain = os.environ.get("FRONTEND_DOMAIN", f"{env}.versiful.io")
+            return MISSING_PRICE_ID_RESPONSE
         
-        # Use provided URLs if available, otherwise construct from frontend_domain
-        if not success_url:
-            success_url = f"https://{frontend_domain}/settings?session_id={{CHECKOUT_SESSION_ID}}"
-        if not cancel_url:
-            cancel_url = f"https://{frontend_domain}/subscription"
+        # Use provided URLs if available, otherwise the frontend defaults
+        success_url = success_url or DEFAULT_SUCCESS_URL
+        cancel_url = cancel_url or DEFAULT_CANCEL_URL
         
         # Get or create Stripe customer
-        user = table.get_item(Key={"userId": user_id}).get("Item", {})
+        user = _get_user_cached(user_id)
         email = user.get("email")
         
         if not email:
-            return {
-                "statusCode": 400,
-                "body": json.dumps({"error": "User email not found"})
-            }
+            return NO_EMAIL_RESPONSE
         
-        if user.get("stripeCustomerId"):
+        new_customer = not user.get("stripeCustomerId")
+        if not new_customer:
             customer_id = user["stripeCustomerId"]
-            logger.info(f"Using existing Stripe customer: {customer_id}")
         else:
             # Create new Stripe customer
-            customer = stripe.Customer.create(
+            customer = _stripe_call(
+                stripe.Customer.create,
                 email=email,
-                metadata={"userId": user_id}
+                metadata={"userId": user_id},
+                idempotency_key=str(uuid.uuid4())  # Safe to retry
             )
             customer_id = customer.id
-            logger.info(f"Created new Stripe customer: {customer_id}")
             
-            # Save customer ID to DynamoDB
-            table.update_item(
-                Key={"userId": user_id},
-                UpdateExpression="SET stripeCustomerId = :cid",
-                ExpressionAttributeValues={":cid": customer_id}
-            )
+            # Save customer ID to DynamoDB, unless a concurrent checkout got there first
+            try:
+                table.update_item(
+                    Key={"userId": user_id},
+                    UpdateExpression="SET stripeCustomerId = :cid",
+                    ConditionExpression="attribute_not_exists(stripeCustomerId)",
+                    ExpressionAttributeValues={":cid": customer_id}
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                customer_id = _adopt_existing_customer(user_id, customer_id)
+            _USER_CACHE.pop(user_id, None)
         
         # Only allow promo codes on monthly plans (not annual)
         monthly_price_ids = [
@@ -123,7 +274,9 @@ def create_checkout_session(event, context):
         allow_promos = price_id in monthly_price_ids
 
         # Create checkout session
-        checkout_session = stripe.checkout.Session.create(
+        checkout_session = _stripe_call(
+            stripe.checkout.Session.create,
+            idempotency_key=str(uuid.uuid4()),  # Safe to retry
             customer=customer_id,
             payment_method_types=["card"],
             line_items=[{"price": price_id, "quantity": 1}],
@@ -134,99 +287,95 @@ def create_checkout_session(event, context):
             metadata={"userId": user_id}
         )
         
-        logger.info(f"Created checkout session: {checkout_session.id}")
+        logger.info(
+            "checkout user=%s customer=%s session=%s new_customer=%s",
+            user_id, customer_id, checkout_session.id, new_customer
+        )
         
         return {
             "statusCode": 200,
-            "headers": {
-                "Content-Type": "application/json"
-            },
-            "body": json.dumps({
+            "headers": JSON_HEADERS,
+            "body": _dumps({
                 "url": checkout_session.url,
                 "sessionId": checkout_session.id
             })
         }
         
     except KeyError as e:
-        logger.error(f"Missing required field: {e}")
+        logger.error("Missing required field: %s", e)
         return {
             "statusCode": 400,
-            "body": json.dumps({"error": f"Missing required field: {str(e)}"})
+            "body": _dumps({"error": f"Missing required field: {str(e)}"})
         }
     except Exception as e:
-        logger.error(f"Error creating checkout session: {e}", exc_info=True)
+        logger.error("Error creating checkout session: %s", e, exc_info=True)
         return {
             "statusCode": 500,
-            "body": json.dumps({"error": str(e)})
+            "body": _dumps({"error": str(e)})
         }
 
 
 def create_portal_session(event, context):
     """Create customer portal session for managing subscription"""
     try:
+        _ensure_stripe()
         user_id = event["requestContext"]["authorizer"]["userId"]
-        body = json.loads(event.get("body", "{}"))
+        body = _loads(event.get("body") or "{}")
         return_url = body.get("returnUrl")  # Allow frontend to specify return URL
         
-        user = table.get_item(Key={"userId": user_id}).get("Item", {})
+        user = _get_user_cached(user_id)
         
         if not user.get("stripeCustomerId"):
-            return {
-                "statusCode": 400,
-                "body": json.dumps({"error": "No active subscription found"})
-            }
-        
-        frontend_domain = os.environ.get("FRONTEND_DOMAIN", f"{env}.versiful.io")
+            return NO_SUBSCRIPTION_RESPONSE
         
-        # Use provided return URL if available, otherwise construct from frontend_domain
-        if not return_url:
-            return_url = f"https://{frontend_domain}/settings"
+        # Use provided return URL if available, otherwise the frontend default
+        return_url = return_url or DEFAULT_RETURN_URL
         
         customer_id = user["stripeCustomerId"]
         
         try:
             # Try to create portal session with stored customer ID
-            portal_session = stripe.billing_portal.Session.create(
+            portal_session = _stripe_call(
+                stripe.billing_portal.Session.create,
                 customer=customer_id,
                 return_url=return_url
             )
             
-            logger.info(f"Created portal session for customer: {customer_id}")
+            logger.info("portal user=%s customer=%s", user_id, customer_id)
             
             return {
                 "statusCode": 200,
-                "headers": {
-                    "Content-Type": "application/json"
-                },
-                "body": json.dumps({"url": portal_session.url})
+                "headers": JSON_HEADERS,
+                "body": _dumps({"url": portal_session.url})
             }
             
         except stripe.error.InvalidRequestError as e:
             # If customer doesn't exist, try to find the correct customer by email
             if "No such customer" in str(e):
-                logger.warning(f"Customer {customer_id} not found in Stripe, attempting to find by email")
+                logger.warning("Customer %s not found in Stripe, attempting to find by email", customer_id)
                 
                 user_email = user.get("email")
                 if not user_email:
-                    logger.error(f"No email found for user {user_id}")
+                    logger.error("No email found for user %s", user_id)
                     raise
                 
                 # Search for customer by email
-                customers = stripe.Customer.list(email=user_email, limit=1)
+                customers = _stripe_call(stripe.Customer.list, email=user_email, limit=1)
                 
                 if not customers.data:
-                    logger.error(f"No Stripe customer found for email {user_email}")
+                    logger.error("No Stripe customer found for email %s", user_email)
                     return {
                         "statusCode": 404,
-                        "body": json.dumps({"error": "No Stripe customer found. Please resubscribe."})
+                        "body": _dumps({"error": "No Stripe customer found. Please resubscribe."})
                     }
                 
                 # Found the customer, update DynamoDB
                 correct_customer_id = customers.data[0].id
-                logger.info(f"Found correct customer ID: {correct_customer_id}, updating DynamoDB")
                 
                 # Get their active subscription
-                subscriptions = stripe.Subscription.list(customer=correct_customer_id, status='active', limit=1)
+                subscriptions = _stripe_call(
+                    stripe.Subscription.list, customer=correct_customer_id, status='active', limit=1
+                )
                 subscription_id = subscriptions.data[0].id if subscriptions.data else None
                 
                 # Update DynamoDB with correct IDs
@@ -242,82 +391,98 @@ def create_portal_session(event, context):
                     UpdateExpression=update_expr,
                     ExpressionAttributeValues=expr_values
                 )
+                _USER_CACHE.pop(user_id, None)
                 
-                logger.info(f"Updated user {user_id} with correct customer ID: {correct_customer_id}")
-                
-                # Retry portal creation with correct customer ID
-                portal_session = stripe.billing_portal.Session.create(
+                # Create the portal session only once the corrected IDs are saved,
+                # so a failed lookup or write doesn't leave an orphaned session
+                portal_session = _stripe_call(
+                    stripe.billing_portal.Session.create,
                     customer=correct_customer_id,
                     return_url=return_url
                 )
                 
+                logger.info(
+                    "portal user=%s customer=%s recovered_from=%s subscription=%s",
+                    user_id, correct_customer_id, customer_id, subscription_id
+                )
+                
                 return {
                     "statusCode": 200,
-                    "headers": {
-                        "Content-Type": "application/json"
-                    },
-                    "body": json.dumps({"url": portal_session.url})
+                    "headers": JSON_HEADERS,
+                    "body": _dumps({"url": portal_session.url})
                 }
             else:
                 # Some other Stripe error
                 raise
         
     except KeyError as e:
-        logger.error(f"Missing required field: {e}")
+        logger.error("Missing required field: %s", e)
         return {
             "statusCode": 400,
-            "body": json.dumps({"error": f"Missing required field: {str(e)}"})
+            "body": _dumps({"error": f"Missing required field: {str(e)}"})
         }
     except Exception as e:
-        logger.error(f"Error creating portal session: {e}", exc_info=True)
+        logger.error("Error creating portal session: %s", e, exc_info=True)
         return {
             "statusCode": 500,
-            "body": json.dumps({"error": str(e)})
+            "body": _dumps({"error": str(e)})
+        }
+
+
+def _select_prices(api_key):
+    """Pick the environment's price IDs from the Stripe API key's account"""
+    if api_key.startswith('sk_live_'):
+        # Production (live mode) - Account 51Qszo...
+        return {
+            "monthly": "price_1ShYvGBcYhqWB9qElNFW7ZDS",  # $9.99/month
+            "annual": "price_1ShYvHBcYhqWB9qEJQBepwRM"     # $99.99/year
+        }
+    elif '51ShHXv' in api_key:
+        # Staging (test mode) - Account 51ShHXv...
+        return {
+            "monthly": "price_1ShZ1aAyC9k5KbaXIxag1Bd6",  # $9.99/month
+            "annual": "price_1ShZ2BAyC9k5KbaXFrJCNHsl"     # $99.99/year
+        }
+    else:
+        # Dev (test mode) - Account 51Qszoe...
+        return {
+            "monthly": "price_1ShYtwB2NunFksMzz5ZHryaw",  # $9.99/month
+            "annual": "price_1ShYtwB2NunFksMzBLTSE1Fe"     # $99.99/year
         }
 
 
+# The API key (and so the price IDs) is fixed for the container's lifetime,
+# so the serialized prices response is built once on first request
+_prices_response = None
+
+
 def get_prices(event, context):
     """Return Stripe price IDs for frontend"""
+    global _prices_response
     try:
-        logger.info("Fetching Stripe price IDs")
-        
-        # Environment-specific price IDs
-        # Determine environment based on Stripe API key
-        is_live_mode = stripe.api_key.startswith('sk_live_')
-        
-        if is_live_mode:
-            # Production (live mode) - Account 51Qszo...
-            prices = {
-                "monthly": "price_1ShYvGBcYhqWB9qElNFW7ZDS",  # $9.99/month
-                "annual": "price_1ShYvHBcYhqWB9qEJQBepwRM"     # $99.99/year
-            }
-        elif '51ShHXv' in stripe.api_key:
-            # Staging (test mode) - Account 51ShHXv...
-            prices = {
-                "monthly": "price_1ShZ1aAyC9k5KbaXIxag1Bd6",  # $9.99/month
-                "annual": "price_1ShZ2BAyC9k5KbaXFrJCNHsl"     # $99.99/year
-            }
-        else:
-            # Dev (test mode) - Account 51Qszoe...
-            prices = {
-                "monthly": "price_1ShYtwB2NunFksMzz5ZHryaw",  # $9.99/month
-                "annual": "price_1ShYtwB2NunFksMzBLTSE1Fe"     # $99.99/year
+        if _prices_response is None:
+            prices = _select_prices(get_secret('stripe_secret_key'))
+            logger.info("Caching price IDs for %s environment: %s", env, prices)
+            _prices_response = {
+                "statusCode": 200,
+                "headers": JSON_HEADERS,
+                "body": _dumps(prices)
             }
         
-        logger.info(f"Returning price IDs for {env} environment: {prices}")
-        
-        return {
-            "statusCode": 200,
-            "headers": {
-                "Content-Type": "application/json"
-            },
-            "body": json.dumps(prices)
-        }
+        return _prices_response
         
     except Exception as e:
-        logger.error(f"Error fetching prices: {e}", exc_info=True)
+        logger.error("Error fetching prices: %s", e, exc_info=True)
         return {
             "statusCode": 500,
-            "body": json.dumps({"error": str(e)})
+            "body": _dumps({"error": str(e)})
         }
 
+
+# (method, last path segment) -> handler; one hash lookup however many routes
+# are added, so new endpoints only need an entry here
+_ROUTES = {
+    ("POST", "checkout"): create_checkout_session,
+    ("POST", "portal"): create_portal_session,
+    ("GET", "prices"): get_prices,
+}
@@ -3,35 +3,28 @@ Unit tests for the Stripe subscription handler Lambda
 """
 import json
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-import sys
-import os
+from unittest.mock import Mock
 
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(__file__))
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
 
-# Mock environment variables before importing handler
-os.environ['ENVIRONMENT'] = 'test'
-os.environ['PROJECT_NAME'] = 'versiful'
-os.environ['SECRET_ARN'] = 'arn:aws:secretsmanager:us-east-1:123456789012:secret:test-secret'
-os.environ['FRONTEND_DOMAIN'] = 'test.versiful.io'
-
-# Mock the secrets helper before importing
-with patch('subscription_handler.get_secret') as mock_get_secret:
-    mock_get_secret.return_value = 'sk_test_fake_key'
-    import subscription_handler
+@pytest.fixture(scope="module")
+def make_event():
+    """Build an API Gateway event for the subscription routes"""
+    def _make_event(path, method="GET", body=None, user="test-user-123"):
+        return {
+            "path": path,
+            "httpMethod": method,
+            "requestContext": {"authorizer": {"userId": user}},
+            "body": json.dumps(body) if body is not None else None,
+        }
+    return _make_event
 
 
 class TestGetPrices:
     """Test the get_prices endpoint"""
     
-    def test_get_prices_returns_correct_structure(self):
+    def test_get_prices_returns_correct_structure(self, make_event, subscription_handler):
         """Test that get_prices returns the expected price IDs"""
-        event = {
-            'path': '/subscription/prices',
-            'httpMethod': 'GET'
-        }
+        event = make_event('/subscription/prices')
         
         response = subscription_handler.get_prices(event, {})
         
@@ -45,39 +38,74 @@ class TestGetPrices:
         assert body['monthly'].startswith('price_')
         assert body['annual'].startswith('price_')
     
-    def test_get_prices_handles_errors(self):
+    def test_get_prices_handles_errors(self, mocker, make_event, subscription_handler):
         """Test that get_prices handles errors gracefully"""
-        event = {
-            'path': '/subscription/prices',
-            'httpMethod': 'GET'
-        }
+        event = make_event('/subscription/prices')
+        mocker.patch('lambdas.subscription.subscription_handler.logger.error')
         
-        with patch('subscription_handler.logger.error') as mock_logger:
-            # Even if there's an internal error, the function should return valid price IDs
-            response = subscription_handler.get_prices(event, {})
-            assert response['statusCode'] == 200
+        # Even if there's an internal error, the function should return valid price IDs
+        response = subscription_handler.get_prices(event, {})
+        assert response['statusCode'] == 200
+
+    
+    def test_select_prices_by_account(self, subscription_handler):
+        """Test that price IDs follow the Stripe account behind the key"""
+        live = subscription_handler._select_prices('sk_live_abc')
+        staging = subscription_handler._select_prices('sk_test_51ShHXvabc')
+        dev = subscription_handler._select_prices('sk_test_51Qszoeabc')
+        
+        assert live['monthly'] == 'price_1ShYvGBcYhqWB9qElNFW7ZDS'
+        assert staging['monthly'] == 'price_1ShZ1aAyC9k5KbaXIxag1Bd6'
+        assert dev['monthly'] == 'price_1ShYtwB2NunFksMzz5ZHryaw'
+
+
+class TestStripeCall:
+    """Test the Stripe retry helper"""
+    
+    def test_retries_rate_limit_then_succeeds(self, mocker, subscription_handler):
+        """Test that rate-limited calls are retried with backoff"""
+        mock_sleep = mocker.patch('lambdas.subscription.subscription_handler.time.sleep')
+        stripe = subscription_handler._ensure_stripe()
+        fn = Mock(side_effect=[stripe.error.RateLimitError('slow down'), 'ok'])
+        
+        assert subscription_handler._stripe_call(fn, limit=1) == 'ok'
+        assert fn.call_count == 2
+        mock_sleep.assert_called_once()
+    
+    def test_gives_up_after_max_attempts(self, mocker, subscription_handler):
+        """Test that the last connection error is re-raised"""
+        mock_sleep = mocker.patch('lambdas.subscription.subscription_handler.time.sleep')
+        stripe = subscription_handler._ensure_stripe()
+        fn = Mock(side_effect=stripe.error.APIConnectionError('down'))
+        
+        with pytest.raises(stripe.error.APIConnectionError):
+            subscription_handler._stripe_call(fn)
+        assert fn.call_count == subscription_handler.STRIPE_MAX_ATTEMPTS
+    
+    def test_does_not_retry_other_errors(self, subscription_handler):
+        """Test that non-transient Stripe errors propagate immediately"""
+        stripe = subscription_handler._ensure_stripe()
+        fn = Mock(side_effect=stripe.error.InvalidRequestError('No such customer', 'customer'))
+        
+        with pytest.raises(stripe.error.InvalidRequestError):
+            subscription_handler._stripe_call(fn)
+        assert fn.call_count == 1
 
 
 class TestCreateCheckoutSession:
     """Test the create_checkout_session endpoint"""
     
-    @patch('subscription_handler.stripe.checkout.Session.create')
-    @patch('subscription_handler.stripe.Customer.create')
-    @patch('subscription_handler.table.get_item')
-    @patch('subscription_handler.table.update_item')
-    def test_create_checkout_session_new_customer(
-        self, 
-        mock_update, 
-        mock_get_item, 
-        mock_create_customer,
-        mock_create_session
-    ):
+    def test_create_checkout_session_new_customer(self, mocker, subscription_handler):
         """Test creating a checkout session for a new customer"""
+        mock_update = mocker.patch('lambdas.subscription.subscription_handler.table.update_item')
+        mock_get_item = mocker.patch('lambdas.subscription.subscription_handler.ddb_client.get_item')
+        mock_create_customer = mocker.patch('lambdas.subscription.subscription_handler.stripe.Customer.create')
+        mock_create_session = mocker.patch('lambdas.subscription.subscription_handler.stripe.checkout.Session.create')
         # Mock user data without existing Stripe customer
         mock_get_item.return_value = {
             'Item': {
-                'userId': 'test-user-123',
-                'email': 'test@example.com'
+                'userId': {'S': 'test-user-123'},
+                'email': {'S': 'test@example.com'}
             }
         }
         
@@ -116,21 +144,48 @@ class TestCreateCheckoutSession:
         # Verify customer was created and saved
         mock_create_customer.assert_called_once()
         mock_update.assert_called_once()
+        assert mock_update.call_args.kwargs['ConditionExpression'] == 'attribute_not_exists(stripeCustomerId)'
+    
+    def test_create_checkout_session_concurrent_customer(self, mocker, subscription_handler):
+        """Test that losing the customer-ID race reuses the saved customer"""
+        mock_update = mocker.patch('lambdas.subscription.subscription_handler.table.update_item')
+        mock_get_item = mocker.patch('lambdas.subscription.subscription_handler.ddb_client.get_item')
+        mock_create_customer = mocker.patch('lambdas.subscription.subscription_handler.stripe.Customer.create')
+        mock_delete_customer = mocker.patch('lambdas.subscription.subscription_handler.stripe.Customer.delete')
+        mock_create_session = mocker.patch('lambdas.subscription.subscription_handler.stripe.checkout.Session.create')
+        from botocore.exceptions import ClientError
+        
+        mock_get_item.side_effect = [
+            {'Item': {'userId': {'S': 'test-user-123'}, 'email': {'S': 'test@example.com'}}},
+            {'Item': {'stripeCustomerId': {'S': 'cus_winner'}}},
+        ]
+        mock_create_customer.return_value = Mock(id='cus_duplicate')
+        mock_update.side_effect = ClientError(
+            {'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem'
+        )
+        mock_create_session.return_value = Mock(id='cs_test789', url='https://checkout.stripe.com/test')
+        
+        event = {
+            'requestContext': {'authorizer': {'userId': 'test-user-123'}},
+            'body': json.dumps({'priceId': 'price_test123'})
+        }
+        
+        response = subscription_handler.create_checkout_session(event, {})
+        
+        assert response['statusCode'] == 200
+        mock_delete_customer.assert_called_once_with('cus_duplicate')
+        assert mock_create_session.call_args.kwargs['customer'] == 'cus_winner'
     
-    @patch('subscription_handler.stripe.checkout.Session.create')
-    @patch('subscription_handler.table.get_item')
-    def test_create_checkout_session_existing_customer(
-        self, 
-        mock_get_item, 
-        mock_create_session
-    ):
+    def test_create_checkout_session_existing_customer(self, mocker, subscription_handler):
         """Test creating a checkout session for an existing customer"""
+        mock_get_item = mocker.patch('lambdas.subscription.subscription_handler.ddb_client.get_item')
+        mock_create_session = mocker.patch('lambdas.subscription.subscription_handler.stripe.checkout.Session.create')
         # Mock user data with existing Stripe customer
         mock_get_item.return_value = {
             'Item': {
-                'userId': 'test-user-123',
-                'email': 'test@example.com',
-                'stripeCustomerId': 'cus_existing123'
+                'userId': {'S': 'test-user-123'},
+                'email': {'S': 'test@example.com'},
+                'stripeCustomerId': {'S': 'cus_existing123'}
             }
         }
         
@@ -161,13 +216,13 @@ class TestCreateCheckoutSession:
         body = json.loads(response['body'])
         assert body['sessionId'] == 'cs_test456'
     
-    @patch('subscription_handler.table.get_item')
-    def test_create_checkout_session_missing_email(self, mock_get_item):
+    def test_create_checkout_session_missing_email(self, mocker, subscription_handler):
         """Test that checkout session fails without user email"""
+        mock_get_item = mocker.patch('lambdas.subscription.subscription_handler.ddb_client.get_item')
         # Mock user data without email
         mock_get_item.return_value = {
             'Item': {
-                'userId': 'test-user-123'
+                'userId': {'S': 'test-user-123'}
             }
         }
         
@@ -193,21 +248,12 @@ class TestCreateCheckoutSession:
         assert 'error' in body
         assert 'email' in body['error'].lower()
     
-    def test_create_checkout_session_missing_price_id(self):
+    def test_create_checkout_session_missing_price_id(self, make_event, subscription_handler):
         """Test that checkout session fails without priceId"""
-        event = {
-            'path': '/subscription/checkout',
-            'httpMethod': 'POST',
-            'requestContext': {
-                'authorizer': {
-                    'userId': 'test-user-123'
-                }
-            },
-            'body': json.dumps({
-                'successUrl': 'https://test.com/success',
-                'cancelUrl': 'https://test.com/cancel'
-            })
-        }
+        event = make_event('/subscription/checkout', 'POST', {
+            'successUrl': 'https://test.com/success',
+            'cancelUrl': 'https://test.com/cancel'
+        })
         
         response = subscription_handler.create_checkout_session(event, {})
         
@@ -220,16 +266,16 @@ class TestCreateCheckoutSession:
 class TestCreatePortalSession:
     """Test the create_portal_session endpoint"""
     
-    @patch('subscription_handler.stripe.billing_portal.Session.create')
-    @patch('subscription_handler.table.get_item')
-    def test_create_portal_session_success(self, mock_get_item, mock_create_portal):
+    def test_create_portal_session_success(self, mocker, subscription_handler):
         """Test creating a customer portal session"""
+        mock_get_item = mocker.patch('lambdas.subscription.subscription_handler.ddb_client.get_item')
+        mock_create_portal = mocker.patch('lambdas.subscription.subscription_handler.stripe.billing_portal.Session.create')
         # Mock user data with Stripe customer
         mock_get_item.return_value = {
             'Item': {
-                'userId': 'test-user-123',
-                'email': 'test@example.com',
-                'stripeCustomerId': 'cus_test123'
+                'userId': {'S': 'test-user-123'},
+                'email': {'S': 'test@example.com'},
+                'stripeCustomerId': {'S': 'cus_test123'}
             }
         }
         
@@ -258,14 +304,14 @@ class TestCreatePortalSession:
         assert 'url' in body
         assert 'billing.stripe.com' in body['url']
     
-    @patch('subscription_handler.table.get_item')
-    def test_create_portal_session_no_customer(self, mock_get_item):
+    def test_create_portal_session_no_customer(self, mocker, subscription_handler):
         """Test that portal session fails without Stripe customer"""
+        mock_get_item = mocker.patch('lambdas.subscription.subscription_handler.ddb_client.get_item')
         # Mock user data without Stripe customer
         mock_get_item.return_value = {
             'Item': {
-                'userId': 'test-user-123',
-                'email': 'test@example.com'
+                'userId': {'S': 'test-user-123'},
+                'email': {'S': 'test@example.com'}
             }
         }
         
@@ -288,37 +334,119 @@ class TestCreatePortalSession:
         body = json.loads(response['body'])
         assert 'error' in body
         assert 'subscription' in body['error'].lower()
-
-
-class TestHandler:
-    """Test the main handler routing"""
     
-    def test_handler_routes_to_prices(self):
-        """Test that handler routes GET /subscription/prices correctly"""
+    def test_create_portal_session_recovers_missing_customer(self, mocker, subscription_handler):
+        """Test that a stale customer ID is replaced by the one found by email"""
+        mock_get_item = mocker.patch('lambdas.subscription.subscription_handler.ddb_client.get_item')
+        mock_create_portal = mocker.patch('lambdas.subscription.subscription_handler.stripe.billing_portal.Session.create')
+        mock_list_customers = mocker.patch('lambdas.subscription.subscription_handler.stripe.Customer.list')
+        mock_list_subscriptions = mocker.patch('lambdas.subscription.subscription_handler.stripe.Subscription.list')
+        mock_update = mocker.patch('lambdas.subscription.subscription_handler.table.update_item')
+        stripe = subscription_handler.stripe
+        
+        mock_get_item.return_value = {
+            'Item': {
+                'email': {'S': 'test@example.com'},
+                'stripeCustomerId': {'S': 'cus_stale'}
+            }
+        }
+        mock_create_portal.side_effect = [
+            stripe.error.InvalidRequestError('No such customer: cus_stale', 'customer'),
+            Mock(url='https://billing.stripe.com/session/test')
+        ]
+        mock_list_customers.return_value = Mock(data=[Mock(id='cus_correct')])
+        mock_list_subscriptions.return_value = Mock(data=[Mock(id='sub_active')])
+        
         event = {
-            'path': '/subscription/prices',
-            'httpMethod': 'GET'
+            'path': '/subscription/portal',
+            'httpMethod': 'POST',
+            'requestContext': {
+                'authorizer': {
+                    'userId': 'test-user-123'
+                }
+            },
+            'body': json.dumps({})
         }
         
-        response = subscription_handler.handler(event, {})
+        response = subscription_handler.create_portal_session(event, {})
         
         assert response['statusCode'] == 200
-        body = json.loads(response['body'])
-        assert 'monthly' in body
-        assert 'annual' in body
+        assert mock_create_portal.call_args[1]['customer'] == 'cus_correct'
+        call_args = mock_update.call_args[1]
+        assert call_args['ExpressionAttributeValues'] == {
+            ':cid': 'cus_correct',
+            ':sid': 'sub_active'
+        }
     
-    def test_handler_invalid_route(self):
-        """Test that handler returns 404 for invalid routes"""
+    def test_create_portal_session_reuses_cached_user(self, mocker, subscription_handler):
+        """Test that repeat calls on a warm container read the user once"""
+        mock_get_item = mocker.patch('lambdas.subscription.subscription_handler.ddb_client.get_item')
+        mock_create_portal = mocker.patch('lambdas.subscription.subscription_handler.stripe.billing_portal.Session.create')
+        mock_get_item.return_value = {
+            'Item': {
+                'userId': {'S': 'test-user-123'},
+                'email': {'S': 'test@example.com'},
+                'stripeCustomerId': {'S': 'cus_test123'}
+            }
+        }
+        mock_create_portal.return_value = Mock(
+            url='https://billing.stripe.com/session/test'
+        )
+        
         event = {
-            'path': '/subscription/invalid',
-            'httpMethod': 'GET'
+            'path': '/subscription/portal',
+            'httpMethod': 'POST',
+            'requestContext': {
+                'authorizer': {
+                    'userId': 'test-user-123'
+                }
+            },
+            'body': json.dumps({})
         }
         
-        response = subscription_handler.handler(event, {})
+        subscription_handler.create_portal_session(event, {})
+        response = subscription_handler.create_portal_session(event, {})
         
-        assert response['statusCode'] == 404
+        assert response['statusCode'] == 200
+        mock_get_item.assert_called_once()
+        call_args = mock_get_item.call_args[1]
+        assert call_args['Key'] == {'userId': {'S': 'test-user-123'}}
+        assert call_args['ProjectionExpression'] == 'email, stripeCustomerId'
+
+
+class TestHandler:
+    """Test the main handler routing"""
+    
+    @pytest.mark.parametrize('method,path,status', [
+        ('GET', '/subscription/prices', 200),
+        ('GET', '/dev/subscription/prices', 200),  # stage prefix still routes
+        ('POST', '/subscription/prices', 404),  # known path, wrong method
+        ('GET', '/subscription/invalid', 404),
+    ])
+    def test_handler_routing(self, make_event, subscription_handler, method, path, status):
+        """Test that handler dispatches on method and last path segment"""
+        response = subscription_handler.handler(make_event(path, method), {})
+        
+        assert response['statusCode'] == status
         body = json.loads(response['body'])
-        assert 'error' in body
+        if status == 200:
+            assert 'monthly' in body
+            assert 'annual' in body
+        else:
+            assert 'error' in body
+    
+    def test_handler_warmer_ping(self, mocker, subscription_handler):
+        """Test that a scheduled warmer ping returns without routing"""
+        mock_get_prices = mocker.patch('lambdas.subscription.subscription_handler.get_prices')
+        mock_prewarm = mocker.patch('lambdas.subscription.subscription_handler._prewarm_stripe_connection')
+        
+        response = subscription_handler.handler({'warmer': True}, {})
+        
+        assert response['statusCode'] == 200
+        assert response['body'] == 'warm'
+        assert subscription_handler.stripe is not None
+        mock_get_prices.assert_not_called()
+        mock_prewarm.assert_called_once()
 
 
 if __name__ == '__main__':
@@ -1,15 +1,18 @@
+import atexit
 import json
 import os
-import re
 import sys
+import time
 import logging
 from typing import Optional
+from collections import OrderedDict
 from datetime import datetime, timezone
 from decimal import Decimal
 
 import boto3
-from boto3.dynamodb.conditions import Attr
-from posthog import Posthog
+from boto3.dynamodb.types import TypeSerializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -17,12 +20,33 @@ logger.setLevel(logging.INFO)
 # Add Lambda layer path for shared code
 sys.path.append('/opt/python')
 
-# Import SMS notifications helper
-try:
-    from sms_notifications import send_welcome_sms
-except ImportError:
-    # Fallback for local testing
-    from lambdas.shared.sms_notifications import send_welcome_sms
+# PostHog and the SMS helper (Twilio) are only needed on phone registration,
+# so they're imported on first use instead of on every cold start
+_posthog_client = None
+
+
+def _get_posthog(api_key):
+    """PostHog client shared across warm invocations (rebuilt if the key changes)"""
+    global _posthog_client
+    if _posthog_client is None or _posthog_client.api_key != api_key:
+        from posthog import Posthog
+        _posthog_client = Posthog(api_key, host='https://us.i.posthog.com')
+    return _posthog_client
+
+
+# Events are sent by the client's background thread instead of a blocking
+# flush per request; send whatever is still queued when the runtime shuts down
+atexit.register(lambda: _posthog_client and _posthog_client.shutdown())
+
+
+def send_welcome_sms(phone_number: str, first_name: str = None):
+    """Send the welcome SMS, importing the SMS notifications helper on first use"""
+    try:
+        from sms_notifications import send_welcome_sms as _send
+    except ImportError:
+        # Fallback for local testing
+        from lambdas.shared.sms_notifications import send_welcome_sms as _send
+    return _send(phone_number, first_name)
 
 # Custom JSON encoder to handle Decimal objects from DynamoDB
 class DecimalEncoder(json.JSONEncoder):
@@ -35,26 +59,156 @@ class DecimalEncoder(json.JSONEncoder):
                 return float(obj)
         return super(DecimalEncoder, self).default(obj)
 
-dynamodb = boto3.resource("dynamodb")
+
+def _decimal_default(obj):
+    """orjson fallback for DynamoDB Decimals, matching DecimalEncoder"""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# orjson (from the shared layer) parses request bodies and serializes
+# DynamoDB items in C; fall back to json + DecimalEncoder if the layer
+# doesn't provide it
+try:
+    import orjson
+
+    def _dumps_item(obj):
+        return orjson.dumps(obj, default=_decimal_default).decode()
+
+    _loads = orjson.loads
+except ImportError:
+    # One encoder reused for every body instead of one built per json.dumps call
+    _dumps_item = DecimalEncoder().encode
+
+    _loads = json.loads
+
+# Fixed response bodies, serialized once per container
+_ERR_UNAUTHORIZED = json.dumps({"error": "Unauthorized - Missing userId"})
+_ERR_MISSING_USER_ID = json.dumps({"error": "Missing userId"})
+_ERR_USER_NOT_FOUND = json.dumps({"error": "User not found"})
+_ERR_INVALID_PHONE = json.dumps({"message": "Invalid phone number"})
+_ERR_NO_FIELDS = json.dumps({"message": "No valid fields to update"})
+_NEW_USER_BODY = json.dumps({"isSubscribed": False, "isRegistered": False})
+_SETTINGS_UPDATED_BODY = json.dumps({"message": "Settings updated"})
+
+# Shared by every response; treat as read-only
+_DEFAULT_HEADERS = {"Content-Type": "application/json"}
+
+
+def _resp(status, body, headers=None):
+    return {"statusCode": status, "headers": headers or _DEFAULT_HEADERS, "body": body}
+
+
+# Keep-alive and a pooled connection so warm invocations skip the TCP/TLS
+# handshake to DynamoDB; adaptive retries back off under throttling. Both
+# Table handles share the resource's client, and so this pool
+boto_config = Config(
+    retries={"mode": "adaptive", "max_attempts": 5},
+    tcp_keepalive=True,
+    max_pool_connections=50,
+)
+dynamodb = boto3.resource("dynamodb", config=boto_config)
+
 env = os.environ["ENVIRONMENT"]
 project_name = os.environ["PROJECT_NAME"]
 table_name = f"{env}-{project_name}-users"
 sms_usage_table_name = os.environ.get("SMS_USAGE_TABLE", f"{env}-{project_name}-sms-usage")
 table = dynamodb.Table(table_name)
 sms_usage_table = dynamodb.Table(sms_usage_table_name)
+# Low-level client behind both tables, for fixed-shape writes whose
+# AttributeValues are built directly instead of through the resource serializer
+_ddb_client = dynamodb.meta.client
+
+# Optional SQS queue for welcome SMS. When set, update_user_settings() enqueues
+# the message and returns; users_handler.welcome_sms_worker() sends it.
+welcome_sms_queue_url = os.environ.get("WELCOME_SMS_QUEUE_URL")
+sqs = boto3.client("sqs", config=boto_config) if welcome_sms_queue_url else None
+
+# userId -> phoneNumber seen on this warm container. Once a user's phone is
+# known, get_user_profile reads the user and SMS-usage items in one batch call
+_PHONE_BY_USER = {}
+_PHONE_BY_USER_MAX = 1024
+
+
+# Monthly SMS limit by subscription status (None = unlimited)
+_MESSAGE_LIMIT = {True: None, False: 5}
+
+
+def _remember_phone(user_id, phone_number):
+    if len(_PHONE_BY_USER) >= _PHONE_BY_USER_MAX:
+        _PHONE_BY_USER.clear()
+    _PHONE_BY_USER[user_id] = phone_number
+
+
+# Short-lived per-container cache of profile reads: userId -> ((user, usage), expiry).
+# Kept short because isSubscribed is written by the Stripe webhook Lambda,
+# which can't invalidate this container's copy
+_PROFILE_CACHE = OrderedDict()
+_PROFILE_TTL = 10  # seconds
+_PROFILE_CACHE_MAX = 1024
+
+
+def _get_user_and_usage_cached(user_id):
+    """Return (user item, sms-usage item), reusing a recent read on warm containers"""
+    cached = _PROFILE_CACHE.get(user_id)
+    if cached and time.monotonic() < cached[1]:
+        _PROFILE_CACHE.move_to_end(user_id)
+        return cached[0]
+    
+    result = _get_user_and_usage(user_id)
+    if result[0] is not None:
+        _PROFILE_CACHE[user_id] = (result, time.monotonic() + _PROFILE_TTL)
+        _PROFILE_CACHE.move_to_end(user_id)
+        if len(_PROFILE_CACHE) > _PROFILE_CACHE_MAX:
+            # Evict the least recently used user
+            _PROFILE_CACHE.popitem(last=False)
+    return result
+
+
+def _get_user_and_usage(user_id):
+    """Return (user item, sms-usage item) for the user, either may be None"""
+    phone_number = _PHONE_BY_USER.get(user_id)
+    if phone_number:
+        response = dynamodb.batch_get_item(RequestItems={
+            table_name: {"Keys": [{"userId": user_id}]},
+            sms_usage_table_name: {"Keys": [{"phoneNumber": phone_number}]},
+        })
+        if not response.get("UnprocessedKeys"):
+            users = response["Responses"].get(table_name, [])
+            usages = response["Responses"].get(sms_usage_table_name, [])
+            user_data = users[0] if users else None
+            # The phone may have changed on another container; only trust the
+            # usage item if it still belongs to the user's current number
+            if not user_data or user_data.get("phoneNumber") == phone_number:
+                return user_data, usages[0] if usages else None
+
+    user_data = table.get_item(Key={"userId": user_id}).get("Item")
+    if not user_data or not user_data.get("phoneNumber"):
+        _PHONE_BY_USER.pop(user_id, None)
+        return user_data, None
+
+    phone_number = user_data["phoneNumber"]
+    _remember_phone(user_id, phone_number)
+    usage_data = sms_usage_table.get_item(Key={"phoneNumber": phone_number}).get("Item")
+    return user_data, usage_data
+
+
+# Bytes to delete when stripping a phone number: everything but ASCII digits and "+"
+_PHONE_DELETE = bytes(i for i in range(256) if not (48 <= i <= 57 or i == 43))
 
 
 def normalize_phone_number(raw: str) -> Optional[str]:
     """Normalize to E.164 (+1########## for US defaults). Return None if invalid."""
     if not raw:
         return None
-    digits = re.sub(r"[^\d+]", "", raw)
-    if digits.startswith("+"):
-        digits_only = re.sub(r"[^\d]", "", digits)
+    kept = raw.encode("ascii", "ignore").translate(None, _PHONE_DELETE)
+    digits_only = kept.replace(b"+", b"").decode()
+    # International when a "+" comes before the first digit
+    if kept.startswith(b"+"):
         if 10 <= len(digits_only) <= 15:
             return f"+{digits_only}"
         return None
-    digits_only = re.sub(r"[^\d]", "", raw)
     if len(digits_only) == 10:
         return f"+1{digits_only}"
     if len(digits_only) == 11 and digits_only.startswith("1"):
@@ -62,23 +216,43 @@ def normalize_phone_number(raw: str) -> Optional[str]:
     return None
 
 
-def ensure_sms_usage_record(phone_number: str, user_id: str):
-    """Create or update sms-usage record with userId for the phone."""
-    now = datetime.now(timezone.utc).isoformat()
-    sms_usage_table.update_item(
-        Key={"phoneNumber": phone_number},
-        UpdateExpression=(
-            "SET userId = if_not_exists(userId, :userId), "
-            "updatedAt = :now"
-        ),
-        ExpressionAttributeValues={
-            ":userId": user_id,
-            ":now": now,
+def _iso_now() -> str:
+    """Current UTC time as an ISO string, at the microsecond precision stored elsewhere."""
+    return datetime.now(timezone.utc).isoformat()
+
+
+_SMS_USAGE_LINK_EXPRESSION = "SET userId = if_not_exists(userId, :userId), updatedAt = :now"
+
+
+def _sms_usage_link_update(phone_number: str, user_id: str) -> dict:
+    """TransactWriteItems Update arguments that attach userId to the phone's sms-usage record."""
+    return {
+        "TableName": sms_usage_table_name,
+        "Key": {"phoneNumber": {"S": phone_number}},
+        "UpdateExpression": _SMS_USAGE_LINK_EXPRESSION,
+        "ExpressionAttributeValues": {
+            ":userId": {"S": user_id},
+            ":now": {"S": _iso_now()},
         },
-    )
-    
-    # Link any SMS history to this user
-    link_sms_history_to_user(phone_number, user_id)
+    }
+
+
+_serializer = TypeSerializer()
+
+
+def _transact_update(table_name: str, update: dict) -> dict:
+    """Convert resource-style update_item arguments into a TransactWriteItems Update."""
+    item = {
+        "TableName": table_name,
+        "Key": {k: _serializer.serialize(v) for k, v in update["Key"].items()},
+        "UpdateExpression": update["UpdateExpression"],
+        "ExpressionAttributeValues": {
+            k: _serializer.serialize(v) for k, v in update["ExpressionAttributeValues"].items()
+        },
+    }
+    if update.get("ExpressionAttributeNames"):
+        item["ExpressionAttributeNames"] = update["ExpressionAttributeNames"]
+    return {"Update": item}
 
 
 def link_sms_history_to_user(phone_number: str, user_id: str):
@@ -102,10 +276,7 @@ def link_sms_history_to_user(phone_number: str, user_id: str):
             logger.warning("POSTHOG_API_KEY not set, skipping SMS history linking")
             return
         
-        posthog = Posthog(
-            posthog_api_key,
-            host='https://us.i.posthog.com'
-        )
+        posthog = _get_posthog(posthog_api_key)
         
         # Look up the anonymous PostHog ID we stored
         try:
@@ -161,9 +332,6 @@ def link_sms_history_to_user(phone_number: str, user_id: str):
                 logger.info(f"Set person properties on {anonymous_id} with userId: {user_id}")
             except Exception as e:
                 logger.error(f"Failed to set person properties after alias: {str(e)}")
-            
-            # Flush to ensure all events are sent before Lambda terminates
-            posthog.flush()
         else:
             logger.info(f"No SMS history to link for {phone_number} (no posthogAnonymousId)")
 
@@ -177,76 +345,98 @@ def create_user(event, headers):
     try:
         user_id = event["requestContext"]["authorizer"]["userId"]
     except (KeyError, TypeError):
-        return {"statusCode": 401, "body": json.dumps({"error": "Unauthorized - Missing userId"})}
+        return _resp(401, _ERR_UNAUTHORIZED, headers)
     
     if not user_id:
-        return {"statusCode": 400, "body": json.dumps({"error": "Missing userId"})}
+        return _resp(400, _ERR_MISSING_USER_ID, headers)
 
-    response = table.get_item(Key={"userId": user_id})
-    if "Item" in response:
-        subscribed = response["Item"].get("isSubscribed", False)
-        registered = response["Item"].get("isRegistered", False)
-        return {"statusCode": 200,"body": json.dumps({"isSubscribed": subscribed, "isRegistered": registered}, cls=DecimalEncoder)}
+    # Create the user only if missing; an existing user falls through to a read
+    now = _iso_now()
+    try:
+        _ddb_client.put_item(
+            TableName=table_name,
+            Item={"userId": {"S": user_id}, "createdAt": {"S": now}},
+            ConditionExpression="attribute_not_exists(userId)"
+        )
+        return _resp(200, _NEW_USER_BODY, headers)
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
 
-    now = datetime.now(timezone.utc).isoformat()
-    table.put_item(Item={"userId": user_id, "createdAt": now})
-    return {"statusCode": 200, "body": json.dumps({"isSubscribed": False, "isRegistered": False})}
+    response = table.get_item(Key={"userId": user_id})
+    item = response.get("Item", {})
+    subscribed = item.get("isSubscribed", False)
+    registered = item.get("isRegistered", False)
+    return _resp(200, _dumps_item({"isSubscribed": subscribed, "isRegistered": registered}), headers)
 
 
 def get_user_profile(event, headers):
     try:
         user_id = event["requestContext"]["authorizer"]["userId"]
     except (KeyError, TypeError):
-        return {"statusCode": 401, "headers": headers, "body": json.dumps({"error": "Unauthorized - Missing userId"})}
+        return _resp(401, _ERR_UNAUTHORIZED, headers)
     
     if not user_id:
-        return {"statusCode": 400, "headers": headers, "body": json.dumps({"error": "Missing userId"})}
+        return _resp(400, _ERR_MISSING_USER_ID, headers)
 
-    response = table.get_item(Key={"userId": user_id})
-    if "Item" in response:
-        user_data = response["Item"]
-        
-        # Fetch SMS usage data if user has a phone number
-        phone_number = user_data.get("phoneNumber")
-        if phone_number:
-            try:
-                usage_response = sms_usage_table.get_item(Key={"phoneNumber": phone_number})
-                if "Item" in usage_response:
-                    usage_data = usage_response["Item"]
-                    # Add usage info to user profile
-                    user_data["smsUsage"] = {
-                        "messagesSent": int(usage_data.get("plan_messages_sent", 0)),
-                        "periodKey": usage_data.get("periodKey"),
-                        "messageLimit": 5 if not user_data.get("isSubscribed") else None  # None = unlimited
-                    }
-            except Exception as e:
-                # Log but don't fail - usage data is optional
-                print(f"Failed to fetch SMS usage for {phone_number}: {str(e)}")
+    try:
+        user_data, usage_data = _get_user_and_usage_cached(user_id)
+    except Exception as e:
+        # Usage data is optional; retry the profile read on its own
+        logger.error(f"Failed to fetch SMS usage for {user_id}: {str(e)}")
+        user_data = table.get_item(Key={"userId": user_id}).get("Item")
+        usage_data = None
+
+    if user_data:
+        if usage_data:
+            # Add usage info to a copy so the cached item stays as read
+            user_data = dict(user_data)
+            user_data["smsUsage"] = {
+                "messagesSent": int(usage_data.get("plan_messages_sent", 0)),
+                "periodKey": usage_data.get("periodKey"),
+                "messageLimit": _MESSAGE_LIMIT[bool(user_data.get("isSubscribed"))]
+            }
         
-        return {"statusCode": 200, "headers": headers, "body": json.dumps(user_data, cls=DecimalEncoder)}
+        return _resp(200, _dumps_item(user_data), headers)
+
+    return _resp(404, _ERR_USER_NOT_FOUND, headers)
+
+
+# frozenset of settings keys (+ createdAt flag) -> (UpdateExpression, ExpressionAttributeNames).
+# Clients send the same few field sets, so each expression is built once per container
+_UPDATE_EXPR_CACHE = {}
+_UPDATE_EXPR_CACHE_MAX = 256
+
+
+def _settings_update_expression(keys, stamp_created):
+    cache_key = (keys, stamp_created)
+    cached = _UPDATE_EXPR_CACHE.get(cache_key)
+    if cached:
+        return cached
+
+    ordered = sorted(keys)
+    update_fields = [f"#{key} = :{key}" for key in ordered]
+    if stamp_created:
+        update_fields.append("createdAt = if_not_exists(createdAt, :createdAt)")
+    cached = ("SET " + ", ".join(update_fields), {f"#{key}": key for key in ordered})
+
+    if len(_UPDATE_EXPR_CACHE) >= _UPDATE_EXPR_CACHE_MAX:
+        _UPDATE_EXPR_CACHE.clear()
+    _UPDATE_EXPR_CACHE[cache_key] = cached
+    return cached
 
-    return {"statusCode": 404, "headers": headers, "body": json.dumps({"error": "User not found"})}
 
 def update_user_settings(event, headers):
     try:
         try:
             user_id = event["requestContext"]["authorizer"]["userId"]
         except (KeyError, TypeError):
-            return {"statusCode": 401, "body": json.dumps({"error": "Unauthorized - Missing userId"})}
+            return _resp(401, _ERR_UNAUTHORIZED, headers)
         
-        body = json.loads(event["body"])
-
-        # Ensure the user item exists before attempting an update
-        existing = table.get_item(Key={"userId": user_id})
-        if "Item" not in existing:
-            now = datetime.now(timezone.utc).isoformat()
-            table.put_item(Item={"userId": user_id, "createdAt": now})
-
-        update_expression = "SET "
-        expression_attribute_values = {}
-        expression_attribute_names = {}
-        update_fields = []
+        raw_body = event.get("body")
+        body = _loads(raw_body) if raw_body else {}
 
+        fields = {}
         for key, value in body.items():
             if value is None:
                 continue  # Ignore null values
@@ -254,50 +444,63 @@ def update_user_settings(event, headers):
             if key == "phoneNumber":
                 normalized = normalize_phone_number(value)
                 if not normalized:
-                    return {
-                        "statusCode": 400,
-                        "body": json.dumps({"message": "Invalid phone number"})
-                    }
+                    return _resp(400, _ERR_INVALID_PHONE, headers)
                 value = normalized
-                ensure_sms_usage_record(value, user_id)
 
-            update_fields.append(f"#{key} = :{key}")
-            expression_attribute_values[f":{key}"] = value
-            expression_attribute_names[f"#{key}"] = key
+            fields[key] = value
 
-        if not update_fields:
-            return {
-                "statusCode": 400,
-                "body": json.dumps({"message": "No valid fields to update"})
-            }
+        if not fields:
+            return _resp(400, _ERR_NO_FIELDS, headers)
 
-        update_expression += ", ".join(update_fields)
-
-        # Perform update in DynamoDB
-        table.update_item(
-            Key={"userId": user_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeNames=expression_attribute_names,
-            ExpressionAttributeValues=expression_attribute_values,
-            ReturnValues="UPDATED_NEW"
+        # UpdateItem creates the user item if it is missing, so stamp
+        # createdAt only on that first write instead of reading first
+        stamp_created = "createdAt" not in body
+        update_expression, expression_attribute_names = _settings_update_expression(
+            frozenset(fields), stamp_created
         )
+        expression_attribute_values = {f":{key}": value for key, value in fields.items()}
+        if stamp_created:
+            expression_attribute_values[":createdAt"] = _iso_now()
+
+        user_update = {
+            "Key": {"userId": user_id},
+            "UpdateExpression": update_expression,
+            "ExpressionAttributeNames": expression_attribute_names,
+            "ExpressionAttributeValues": expression_attribute_values,
+        }
+        phone_number = expression_attribute_values.get(":phoneNumber")
+
+        if phone_number:
+            # Save the user and link the phone's sms-usage record in one round trip
+            _ddb_client.transact_write_items(TransactItems=[
+                _transact_update(table_name, user_update),
+                {"Update": _sms_usage_link_update(phone_number, user_id)},
+            ])
+            _remember_phone(user_id, phone_number)
+            link_sms_history_to_user(phone_number, user_id)
+        else:
+            # Perform update (upsert) in DynamoDB
+            table.update_item(**user_update, ReturnValues="UPDATED_NEW")
+        _PROFILE_CACHE.pop(user_id, None)
 
         # Send welcome SMS if this is a new registration (isRegistered=true with a phone number)
         is_new_registration = expression_attribute_values.get(":isRegistered") is True
-        phone_number = expression_attribute_values.get(":phoneNumber")
         
         if is_new_registration and phone_number:
             first_name = expression_attribute_values.get(":firstName")
             try:
-                send_welcome_sms(phone_number, first_name)
+                if welcome_sms_queue_url:
+                    sqs.send_message(
+                        QueueUrl=welcome_sms_queue_url,
+                        MessageBody=json.dumps({"phoneNumber": phone_number, "firstName": first_name})
+                    )
+                else:
+                    send_welcome_sms(phone_number, first_name)
             except Exception as sms_error:
                 # Log error but don't fail the request
-                print(f"Failed to send welcome SMS to {phone_number}: {str(sms_error)}")
+                logger.error(f"Failed to send welcome SMS to {phone_number}: {str(sms_error)}")
 
-        return {"statusCode": 200, "body": json.dumps({"message": "Settings updated"})}
+        return _resp(200, _SETTINGS_UPDATED_BODY, headers)
 
     except Exception as e:
-        return {
-            "statusCode": 500,
-            "body": json.dumps({"error": str(e)})
-        }
\ No newline at end of file
+        return _resp(500, json.dumps({"error": str(e)}), headers)
\ No newline at end of file
@@ -18,44 +18,61 @@ if not logger.handlers:
     handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
     logger.addHandler(handler)
 
+NOT_FOUND_RESPONSE = {
+    "statusCode": 404,
+    "body": json.dumps({"error": "Invalid route"})
+}
+
+# (method, last path segment) -> handler. The lambdas look the helpers up at
+# call time, so they can still be patched after import
+_ROUTES = {
+    ("GET", "users"): lambda event: get_user_profile(event, {}),
+    ("POST", "users"): lambda event: create_user(event, {}),
+    ("PUT", "users"): lambda event: update_user_settings(event, {}),
+}
+
+
 def handler(event, context):
+    # Scheduled warmer ping: the container (and its imports and clients) is
+    # now initialised, so stop before routing
+    if event.get("warmer") or event.get("source") == "aws.events":
+        return {"statusCode": 200, "body": "warm"}
 
     path = event.get("path", "")
     method = event.get("httpMethod", "")
 
-    logger.info('Response: %s', event)
-    try:
+    # Full events run to several KB; only format them when debugging
+    logger.info("%s %s request_id=%s", method, path, getattr(context, "aws_request_id", None))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("event=%s", event)
 
-        if method == "GET":
-            if path.endswith("/users"):
-                return get_user_profile(event, {})
-        if method == "POST":
-            if path.endswith("/users"):
-                r = create_user(event, {})
-
-                return r
-        if method == "PUT":
-            if path.endswith("/users"):
-                r = update_user_settings(event, {})
-                logger.info(r)
-                return r
-
-
-        #
-        # if path.endswith("/users") and method == "POST":
-        #     return create_user(body, headers)
-        # elif path.endswith("/user/profile") and method == "GET":
-        #     return get_user_profile(body, headers)
-        # elif path.endswith("/user/settings") and method == "POST":
-        #     return update_user_settings(body, headers)
+    route = _ROUTES.get((method, path.rpartition("/")[2]))
+    try:
+        if route:
+            return route(event)
         else:
-            return {
-                "statusCode": 404,
-                "body": json.dumps({"error": "Invalid route"})
-            }
+            return NOT_FOUND_RESPONSE
     except Exception as e:
         logger.error(e)
         return {
             "statusCode": 500,
             "body": json.dumps({"error": str(e)})
         }
+
+
+def welcome_sms_worker(event, context):
+    """Send welcome SMS queued by update_user_settings (SQS trigger).
+    
+    Failed records are reported individually so SQS only redelivers
+    those (ReportBatchItemFailures).
+    """
+    failures = []
+    for record in event.get("Records", []):
+        try:
+            message = json.loads(record["body"])
+            send_welcome_sms(message["phoneNumber"], message.get("firstName"))
+        except Exception as e:
+            logger.error("Error sending queued welcome SMS %s: %s", record.get("messageId"), e)
+            failures.append({"itemIdentifier": record["messageId"]})
+
+    return {"batchItemFailures": failures}
@@ -1,8 +1,10 @@
 import requests
+from requests.adapters import HTTPAdapter
 
 import boto3
 import json
 import os
+from functools import lru_cache
 from botocore.exceptions import ClientError
 from twilio.rest import Client
 import openai
@@ -10,20 +12,24 @@ import openai
 # Get phone from environment variable with fallback
 VERSIFUL_PHONE = os.environ.get("VERSIFUL_PHONE", "+18336811158")
 
+# Secrets Manager client shared by both secret lookups
+secrets_client = boto3.client('secretsmanager', region_name="us-east-1")
 
+# API clients built on first use and reused across warm invocations
+_openai_client = None
+_twilio_client = None
+
+# Pooled HTTPS session so image requests reuse the connection to OpenAI
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+
+@lru_cache(maxsize=1)
 def get_secret():
     secret_name = "dev-versiful_secrets"
-    region_name = "us-east-1"
-
-    # Create a Secrets Manager client
-    session = boto3.session.Session()
-    client = session.client(
-        service_name='secretsmanager',
-        region_name=region_name
-    )
 
     try:
-        get_secret_value_response = client.get_secret_value(
+        get_secret_value_response = secrets_client.get_secret_value(
             SecretId=secret_name
         )
     except ClientError as e:
@@ -35,6 +41,22 @@ def get_secret():
     return json.loads(secret)
     # Your code goes here.
 
+
+def _get_openai():
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = openai.OpenAI(api_key=get_secret()['gpt'])
+    return _openai_client
+
+
+def _get_twilio():
+    global _twilio_client
+    if _twilio_client is None:
+        twilio_auth = get_twilio_secrets()
+        _twilio_client = Client(twilio_auth['twilio_account_sid'], twilio_auth['twilio_auth'])
+    return _twilio_client
+
+
 def generate_response(message, model="gpt-4o"):
     """
         Sends a message to OpenAI's GPT-4o model and returns the response.
@@ -45,7 +67,7 @@ def generate_response(message, model="gpt-4o"):
         :return: The model's response
         """
 
-    client = openai.OpenAI(api_key=get_secret()['gpt'])
+    client = _get_openai()
 
     try:
         response = client.chat.completions.create(
@@ -58,36 +80,29 @@ def generate_response(message, model="gpt-4o"):
 
 def generate_photo(prompt):
     url = "https://api.openai.com/v1/images/generations"
-    payload = json.dumps({
+    payload = {
         "model": "dall-e-3",
         "prompt": f"{prompt}",
         "n": 1,
         "size": "1024x1024"
-    })
+    }
     auth = get_secret()['dalle_secret']
     headers = {
-        'Content-Type': 'application/json',
         'Authorization': f'Bearer {auth}'
     }
 
-    response = requests.request("POST", url, headers=headers, data=payload)
-    r = json.loads(response.text)
+    # json= serializes the payload and sets Content-Type: application/json
+    response = _http.post(url, headers=headers, json=payload)
+    r = response.json()
 
     return r
 
+@lru_cache(maxsize=1)
 def get_twilio_secrets():
     secret_name = "twilio_keys"
-    region_name = "us-east-1"
-
-    # Create a Secrets Manager client
-    session = boto3.session.Session()
-    client = session.client(
-        service_name='secretsmanager',
-        region_name=region_name
-    )
 
     try:
-        get_secret_value_response = client.get_secret_value(
+        get_secret_value_response = secrets_client.get_secret_value(
             SecretId=secret_name
         )
     except ClientError as e:
@@ -100,11 +115,7 @@ def get_twilio_secrets():
 
 
 def send_message(to_num, message):
-    twilio_auth = get_twilio_secrets()
-    account_sid = twilio_auth['twilio_account_sid']
-    auth_token = twilio_auth['twilio_auth']
-
-    client = Client(account_sid, auth_token)
+    client = _get_twilio()
 
     message = client.messages.create(
         from_=VERSIFUL_PHONE,
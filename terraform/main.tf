@@ -131,6 +131,9 @@ module "lambdas" {
   versiful_phone           = var.versiful_phone
   posthog_apikey           = var.posthog_apikey
   promo_codes_dynamodb_arn = module.dynamodb.promo_codes_dynamodb_arn
+
+  # Keep warm webhook containers in prod so Stripe retry bursts don't all cold start
+  stripe_webhook_provisioned_concurrency = var.environment == "prod" ? 2 : 0
 }
 
 module "cognito" {
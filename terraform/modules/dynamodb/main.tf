@@ -7,6 +7,19 @@ resource "aws_dynamodb_table" "users" {
     name = "userId"
     type = "S"
   }
+
+  attribute {
+    name = "stripeCustomerId"
+    type = "S"
+  }
+
+  # GSI for Stripe webhooks to find the user by customer ID without a table scan
+  global_secondary_index {
+    name               = "stripeCustomerId-index"
+    hash_key           = "stripeCustomerId"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["phoneNumber"]
+  }
 }
 
 # Promo code tracking for Stripe coupons/promotions
@@ -21,7 +21,8 @@ data "archive_file" "sms_zip" {
     "*.pyc",
     "*.zip",
     ".pytest_cache",
-    "*.egg-info"
+    "*.egg-info",
+    "test_*.py"
   ]
 }
 
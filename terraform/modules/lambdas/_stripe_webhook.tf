@@ -8,7 +8,8 @@ data "archive_file" "stripe_webhook_zip" {
     "*.pyc",
     "*.zip",
     ".pytest_cache",
-    "*.egg-info"
+    "*.egg-info",
+    "test_*.py"
   ]
 }
 
@@ -22,9 +23,98 @@ resource "aws_lambda_function" "stripe_webhook_function" {
   source_code_hash = data.archive_file.stripe_webhook_zip.output_base64sha256
   timeout          = 30
 
+  # Published versions back the "live" alias (required for provisioned concurrency).
+  # Reserved concurrency bounds how many containers a Stripe retry storm can fan out to.
+  publish                        = true
+  reserved_concurrent_executions = var.stripe_webhook_reserved_concurrency
+
   # Use Lambda layer for shared dependencies (stripe, secrets_helper)
   layers = [aws_lambda_layer_version.shared_dependencies.arn]
 
+  environment {
+    variables = {
+      ENVIRONMENT      = var.environment
+      PROJECT_NAME     = var.project_name
+      SECRET_ARN       = var.secret_arn
+      VERSIFUL_PHONE   = var.versiful_phone
+      WORKER_QUEUE_URL = aws_sqs_queue.stripe_webhook_queue.url
+    }
+  }
+
+  tags = {
+    Environment = var.environment
+    Service     = "stripe-webhook"
+  }
+}
+
+# Alias API Gateway invokes; provisioned concurrency is attached here
+resource "aws_lambda_alias" "stripe_webhook_live" {
+  name             = "live"
+  function_name    = aws_lambda_function.stripe_webhook_function.function_name
+  function_version = aws_lambda_function.stripe_webhook_function.version
+}
+
+resource "aws_lambda_provisioned_concurrency_config" "stripe_webhook" {
+  count                             = var.stripe_webhook_provisioned_concurrency > 0 ? 1 : 0
+  function_name                     = aws_lambda_function.stripe_webhook_function.function_name
+  qualifier                         = aws_lambda_alias.stripe_webhook_live.name
+  provisioned_concurrent_executions = var.stripe_webhook_provisioned_concurrency
+}
+
+# Queue for verified webhook events; the webhook Lambda acks Stripe immediately
+# and the worker below does the DynamoDB/Stripe work
+resource "aws_sqs_queue" "stripe_webhook_dlq" {
+  name                      = "${var.environment}-${var.project_name}-stripe-webhook-dlq"
+  message_retention_seconds = 1209600
+}
+
+resource "aws_sqs_queue" "stripe_webhook_queue" {
+  name                       = "${var.environment}-${var.project_name}-stripe-webhook"
+  visibility_timeout_seconds = 180 # >= 6x worker timeout
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.stripe_webhook_dlq.arn
+    maxReceiveCount     = 5
+  })
+}
+
+resource "aws_iam_policy" "stripe_webhook_queue_policy" {
+  name        = "${var.environment}-stripe-webhook-queue-policy"
+  description = "Allow Lambda to send and consume Stripe webhook queue messages"
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect = "Allow",
+        Action = [
+          "sqs:SendMessage",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
+        ],
+        Resource = aws_sqs_queue.stripe_webhook_queue.arn
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "attach_stripe_webhook_queue_policy" {
+  role       = aws_iam_role.lambda_exec_role.name
+  policy_arn = aws_iam_policy.stripe_webhook_queue_policy.arn
+}
+
+# Worker Lambda that processes queued webhook events
+resource "aws_lambda_function" "stripe_webhook_worker_function" {
+  function_name    = "${var.environment}-${var.project_name}-stripe-webhook-worker"
+  handler          = "webhook_handler.worker_handler"
+  runtime          = "python3.11"
+  role             = aws_iam_role.lambda_exec_role.arn
+  filename         = data.archive_file.stripe_webhook_zip.output_path
+  source_code_hash = data.archive_file.stripe_webhook_zip.output_base64sha256
+  timeout          = 30
+
+  layers = [aws_lambda_layer_version.shared_dependencies.arn]
+
   environment {
     variables = {
       ENVIRONMENT    = var.environment
@@ -40,11 +130,21 @@ resource "aws_lambda_function" "stripe_webhook_function" {
   }
 }
 
+resource "aws_lambda_event_source_mapping" "stripe_webhook_worker_trigger" {
+  event_source_arn        = aws_sqs_queue.stripe_webhook_queue.arn
+  function_name           = aws_lambda_function.stripe_webhook_worker_function.arn
+  batch_size              = 10
+  function_response_types = ["ReportBatchItemFailures"]
+
+  depends_on = [aws_iam_role_policy_attachment.attach_stripe_webhook_queue_policy]
+}
+
 # Lambda Permission for API Gateway
 resource "aws_lambda_permission" "stripe_webhook_permission" {
   statement_id  = "AllowAPIGatewayInvokeStripeWebhook"
   action        = "lambda:InvokeFunction"
   function_name = aws_lambda_function.stripe_webhook_function.function_name
+  qualifier     = aws_lambda_alias.stripe_webhook_live.name
   principal     = "apigateway.amazonaws.com"
   source_arn    = "${var.apiGateway_execution_arn}/*/*"
   
@@ -57,7 +157,7 @@ resource "aws_lambda_permission" "stripe_webhook_permission" {
 resource "aws_apigatewayv2_integration" "stripe_webhook_integration" {
   api_id           = var.apiGateway_lambda_api_id
   integration_type = "AWS_PROXY"
-  integration_uri  = aws_lambda_function.stripe_webhook_function.invoke_arn
+  integration_uri  = aws_lambda_alias.stripe_webhook_live.invoke_arn
 }
 
 # Route: POST /stripe/webhook
@@ -8,10 +8,17 @@ data "archive_file" "subscription_zip" {
     "*.pyc",
     "*.zip",
     ".pytest_cache",
-    "*.egg-info"
+    "*.egg-info",
+    "test_*.py",
+    "conftest.py"
   ]
 }
 
+# AWS-managed Parameters and Secrets Lambda Extension (x86_64)
+locals {
+  secrets_extension_layer_arn = "arn:aws:lambda:${var.region}:177933569100:layer:AWS-Parameters-and-Secrets-Lambda-Extension:11"
+}
+
 # Deploy subscription Lambda function
 resource "aws_lambda_function" "subscription_function" {
   function_name    = "${var.environment}-${var.project_name}-subscription"
@@ -23,14 +30,19 @@ resource "aws_lambda_function" "subscription_function" {
   timeout          = 30
 
   # Use Lambda layer for shared dependencies (stripe, secrets_helper)
-  layers = [aws_lambda_layer_version.shared_dependencies.arn]
+  # Parameters and Secrets extension caches the Stripe secret next to the function
+  layers = [
+    aws_lambda_layer_version.shared_dependencies.arn,
+    local.secrets_extension_layer_arn
+  ]
 
   environment {
     variables = {
-      ENVIRONMENT      = var.environment
-      PROJECT_NAME     = var.project_name
-      SECRET_ARN       = var.secret_arn
-      FRONTEND_DOMAIN  = var.frontend_domain
+      ENVIRONMENT                            = var.environment
+      PROJECT_NAME                           = var.project_name
+      SECRET_ARN                             = var.secret_arn
+      FRONTEND_DOMAIN                        = var.frontend_domain
+      PARAMETERS_SECRETS_EXTENSION_HTTP_PORT = "2773"
     }
   }
 
@@ -86,3 +98,24 @@ resource "aws_apigatewayv2_route" "subscription_prices" {
   # No authorization_type - public endpoint
 }
 
+# Warmer: ping the subscription Lambda every 5 minutes so checkout/portal
+# requests don't land on a cold container (handler returns early on {"warmer": true})
+resource "aws_cloudwatch_event_rule" "subscription_warmer" {
+  name                = "${var.environment}-${var.project_name}-subscription-warmer"
+  description         = "Keep the subscription Lambda warm"
+  schedule_expression = "rate(5 minutes)"
+}
+
+resource "aws_cloudwatch_event_target" "subscription_warmer" {
+  rule  = aws_cloudwatch_event_rule.subscription_warmer.name
+  arn   = aws_lambda_function.subscription_function.arn
+  input = jsonencode({ warmer = true })
+}
+
+resource "aws_lambda_permission" "subscription_warmer_permission" {
+  statement_id  = "AllowEventBridgeInvokeSubscriptionWarmer"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.subscription_function.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.subscription_warmer.arn
+}
@@ -41,15 +41,107 @@ resource "aws_lambda_function" "users_function" {
 
   environment {
     variables = {
-      ENVIRONMENT = var.environment
-      PROJECT_NAME = var.project_name
+      ENVIRONMENT           = var.environment
+      PROJECT_NAME          = var.project_name
+      SMS_USAGE_TABLE       = "${var.environment}-${var.project_name}-sms-usage"
+      USERS_TABLE           = "${var.environment}-${var.project_name}-users"
+      SECRET_ARN            = var.secret_arn
+      VERSIFUL_PHONE        = var.versiful_phone
+      POSTHOG_API_KEY       = var.posthog_apikey
+      WELCOME_SMS_QUEUE_URL = aws_sqs_queue.welcome_sms_queue.url
+    }
+
+  }
+
+  tags = {
+    Environment = var.environment
+  }
+}
+
+# Warmer: ping the users Lambda every 5 minutes so profile reads and
+# settings updates don't land on a cold container (handler returns early on {"warmer": true})
+resource "aws_cloudwatch_event_rule" "users_warmer" {
+  name                = "${var.environment}-${var.project_name}-users-warmer"
+  description         = "Keep the users Lambda warm"
+  schedule_expression = "rate(5 minutes)"
+}
+
+resource "aws_cloudwatch_event_target" "users_warmer" {
+  rule  = aws_cloudwatch_event_rule.users_warmer.name
+  arn   = aws_lambda_function.users_function.arn
+  input = jsonencode({ warmer = true })
+}
+
+resource "aws_lambda_permission" "users_warmer_permission" {
+  statement_id  = "AllowEventBridgeInvokeUsersWarmer"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.users_function.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.users_warmer.arn
+}
+
+# Queue for welcome SMS; PUT /users enqueues and returns, the worker below
+# sends the Twilio messages
+resource "aws_sqs_queue" "welcome_sms_dlq" {
+  name                      = "${var.environment}-${var.project_name}-welcome-sms-dlq"
+  message_retention_seconds = 1209600
+}
+
+resource "aws_sqs_queue" "welcome_sms_queue" {
+  name                       = "${var.environment}-${var.project_name}-welcome-sms"
+  visibility_timeout_seconds = 180 # >= 6x worker timeout
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.welcome_sms_dlq.arn
+    maxReceiveCount     = 3
+  })
+}
+
+resource "aws_iam_policy" "welcome_sms_queue_policy" {
+  name        = "${var.environment}-welcome-sms-queue-policy"
+  description = "Allow Lambda to send and consume welcome SMS queue messages"
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect = "Allow",
+        Action = [
+          "sqs:SendMessage",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
+        ],
+        Resource = aws_sqs_queue.welcome_sms_queue.arn
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "attach_welcome_sms_queue_policy" {
+  role       = aws_iam_role.lambda_exec_role.name
+  policy_arn = aws_iam_policy.welcome_sms_queue_policy.arn
+}
+
+# Worker Lambda that sends queued welcome SMS
+resource "aws_lambda_function" "welcome_sms_worker_function" {
+  function_name    = "${var.environment}-${var.project_name}-welcome-sms-worker"
+  handler          = "users_handler.welcome_sms_worker"
+  runtime          = "python3.11"
+  role             = aws_iam_role.lambda_exec_role.arn
+  filename         = data.archive_file.users_zip.output_path
+  source_code_hash = data.archive_file.users_zip.output_base64sha256
+  timeout          = 30
+
+  layers = [aws_lambda_layer_version.shared_dependencies.arn]
+
+  environment {
+    variables = {
+      ENVIRONMENT     = var.environment
+      PROJECT_NAME    = var.project_name
       SMS_USAGE_TABLE = "${var.environment}-${var.project_name}-sms-usage"
-      USERS_TABLE     = "${var.environment}-${var.project_name}-users"
       SECRET_ARN      = var.secret_arn
       VERSIFUL_PHONE  = var.versiful_phone
-      POSTHOG_API_KEY = var.posthog_apikey
     }
-
   }
 
   tags = {
@@ -57,6 +149,15 @@ resource "aws_lambda_function" "users_function" {
   }
 }
 
+resource "aws_lambda_event_source_mapping" "welcome_sms_worker_trigger" {
+  event_source_arn        = aws_sqs_queue.welcome_sms_queue.arn
+  function_name           = aws_lambda_function.welcome_sms_worker_function.arn
+  batch_size              = 10
+  function_response_types = ["ReportBatchItemFailures"]
+
+  depends_on = [aws_iam_role_policy_attachment.attach_welcome_sms_queue_policy]
+}
+
 # Lambda Permissions
 resource "aws_lambda_permission" "users_permission" {
   statement_id  = "AllowAPIGatewayInvokeSms"
@@ -32,6 +32,7 @@ resource "aws_iam_policy" "dynamodb_access" {
           "dynamodb:GetItem", 
           "dynamodb:PutItem", 
           "dynamodb:UpdateItem",
+          "dynamodb:BatchGetItem",
           "dynamodb:Query",
           "dynamodb:Scan"
         ]
@@ -181,6 +182,14 @@ resource "aws_iam_role_policy_attachment" "attach_cognito_admin_policy" {
 # This prevents singleton resource conflicts across environments
 # CloudWatch log group is also managed in the apiGateway module
 
+# AWS services the shared-layer functions (sms, stripe_webhook, subscription,
+# users) create clients for. boto3 loads service models from disk, so every
+# other model is stripped from the layer to cut its size and cold-start I/O.
+locals {
+  shared_layer_boto3_services = ["dynamodb", "secretsmanager", "sqs", "lambda"]
+  shared_layer_keep_args      = join(" ", [for s in local.shared_layer_boto3_services : "! -name ${s}"])
+}
+
 # Package the layer
 resource "null_resource" "package_layer" {
   provisioner "local-exec" {
@@ -189,6 +198,8 @@ resource "null_resource" "package_layer" {
       rm -rf python && \
       mkdir python && \
       pip install -r requirements.txt -t python && \
+      find python/botocore/data python/boto3/data -mindepth 1 -maxdepth 1 -type d ${local.shared_layer_keep_args} -exec rm -rf {} + && \
+      PYTHONPATH=python python -c "import boto3; [boto3.client(s, region_name='us-east-1') for s in '${join(" ", local.shared_layer_boto3_services)}'.split()]; boto3.resource('dynamodb', region_name='us-east-1')" && \
       cp ../shared/*.py python/ && \
       zip -r layer.zip python
     EOT
@@ -196,6 +207,7 @@ resource "null_resource" "package_layer" {
 
   triggers = {
     requirements   = filemd5("${path.module}/../../../lambdas/layer/requirements.txt")
+    boto3_services = join(",", local.shared_layer_boto3_services)
     shared_secrets = filemd5("${path.module}/../../../lambdas/shared/secrets_helper.py")
     shared_sms     = filemd5("${path.module}/../../../lambdas/shared/sms_notifications.py")
   }
@@ -73,4 +73,15 @@ variable "posthog_apikey" {
 variable "promo_codes_dynamodb_arn" {
   description = "ARN of the DynamoDB table for promo codes"
   type        = string
-}
\ No newline at end of file
+}
+variable "stripe_webhook_provisioned_concurrency" {
+  description = "Provisioned concurrency for the Stripe webhook Lambda live alias (0 disables)"
+  type        = number
+  default     = 0
+}
+
+variable "stripe_webhook_reserved_concurrency" {
+  description = "Reserved concurrency cap for the Stripe webhook Lambda (-1 leaves it unreserved)"
+  type        = number
+  default     = 10
+}
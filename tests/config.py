@@ -7,37 +7,41 @@ import os
 # Determine environment from environment variable or default to dev
 ENVIRONMENT = os.getenv('ENVIRONMENT', 'dev')
 
-# Environment-specific configurations
-ENVIRONMENTS = {
-    'dev': {
-        'api_base_url': os.getenv('API_BASE_URL', 'https://api.dev.versiful.io'),
-        'user_pool_id': os.getenv('USER_POOL_ID'),
-        'user_pool_client_id': os.getenv('USER_POOL_CLIENT_ID'),
-        'region': 'us-east-1',
-        'dynamodb_table': 'dev-versiful-users',
-    },
-    'staging': {
-        'api_base_url': os.getenv('API_BASE_URL', 'https://api.staging.versiful.io'),
-        'user_pool_id': os.getenv('USER_POOL_ID'),
-        'user_pool_client_id': os.getenv('USER_POOL_CLIENT_ID'),
-        'region': 'us-east-1',
-        'dynamodb_table': 'staging-versiful-users',
-    },
-    'prod': {
-        'api_base_url': os.getenv('API_BASE_URL', 'https://api.versiful.io'),
-        'user_pool_id': os.getenv('USER_POOL_ID'),
-        'user_pool_client_id': os.getenv('USER_POOL_CLIENT_ID'),
-        'region': 'us-east-1',
-        'dynamodb_table': 'prod-versiful-users',
+# Environment-specific configurations. Built on each call rather than at import,
+# because AUTO_FETCH_TEST_TOKEN fills os.environ from the test secret in a
+# session fixture, after this module is imported
+def _environments():
+    return {
+        'dev': {
+            'api_base_url': os.getenv('API_BASE_URL', 'https://api.dev.versiful.io'),
+            'user_pool_id': os.getenv('USER_POOL_ID'),
+            'user_pool_client_id': os.getenv('USER_POOL_CLIENT_ID'),
+            'region': 'us-east-1',
+            'dynamodb_table': 'dev-versiful-users',
+        },
+        'staging': {
+            'api_base_url': os.getenv('API_BASE_URL', 'https://api.staging.versiful.io'),
+            'user_pool_id': os.getenv('USER_POOL_ID'),
+            'user_pool_client_id': os.getenv('USER_POOL_CLIENT_ID'),
+            'region': 'us-east-1',
+            'dynamodb_table': 'staging-versiful-users',
+        },
+        'prod': {
+            'api_base_url': os.getenv('API_BASE_URL', 'https://api.versiful.io'),
+            'user_pool_id': os.getenv('USER_POOL_ID'),
+            'user_pool_client_id': os.getenv('USER_POOL_CLIENT_ID'),
+            'region': 'us-east-1',
+            'dynamodb_table': 'prod-versiful-users',
+        }
     }
-}
 
 # Get config for current environment
 def get_config():
     """Get configuration for the current environment."""
-    return ENVIRONMENTS.get(ENVIRONMENT, ENVIRONMENTS['dev'])
-
-# Test credentials (should come from GitHub secrets)
-TEST_USER_EMAIL = os.getenv('TEST_USER_EMAIL')
-TEST_USER_PASSWORD = os.getenv('TEST_USER_PASSWORD')
+    environments = _environments()
+    return environments.get(ENVIRONMENT, environments['dev'])
 
+# Test credentials (should come from GitHub secrets or the auto-fetched test secret)
+def get_test_credentials():
+    """Return (TEST_USER_EMAIL, TEST_USER_PASSWORD) as currently set."""
+    return os.getenv('TEST_USER_EMAIL'), os.getenv('TEST_USER_PASSWORD')
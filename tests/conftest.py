@@ -1,11 +1,9 @@
 import sys
 import os
 import pytest
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from dotenv import load_dotenv
-from tests.scripts.load_test_secrets import fetch_secret
-from tests.scripts.get_test_auth_token import get_access_token
-import boto3
-from botocore.exceptions import ClientError
 
 # Add project root to sys.path for module imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -14,86 +12,149 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 load_dotenv(dotenv_path=".env")  # explicit path to avoid find_dotenv issues
 load_dotenv(dotenv_path=".env.test.generated", override=False)
 
-# Optional: auto-fetch secrets and token for e2e tests when enabled
+# Optional: auto-fetch secrets and token for e2e tests when enabled. The AWS
+# calls run in session fixtures, only when a test asks for them
 AUTO_FETCH = os.getenv("AUTO_FETCH_TEST_TOKEN")
-if AUTO_FETCH:
+
+
+def _fast_fail_config():
+    """botocore config so unreachable AWS fails in seconds, not after the default 60s"""
+    from botocore.config import Config
+    return Config(retries={"max_attempts": 2}, connect_timeout=2, read_timeout=5)
+
+
+@lru_cache(maxsize=None)
+def _aws_session(region):
+    """One boto3 session per region, so its clients share loaded endpoint data and credentials"""
+    import boto3
+    return boto3.session.Session(region_name=region)
+
+
+@pytest.fixture(scope="session")
+def test_secrets():
+    """Load the test secret into os.environ when AUTO_FETCH_TEST_TOKEN is set; return it."""
+    if not AUTO_FETCH:
+        return {}
+
+    # boto3 and the helper scripts stay off the collection path for unit runs
+    from tests.scripts.load_test_secrets import fetch_secret
+
     environment = os.getenv("ENVIRONMENT", "dev")
     project = os.getenv("PROJECT_NAME", "versiful")
     region = os.getenv("AWS_REGION", "us-east-1")
     secret_id = os.getenv("TEST_SECRET_ID", f"{environment}-{project}_secrets")
     try:
-        secret = fetch_secret(secret_id, region)
-
-        # Populate env vars from secret if present
-        for key in [
-            "TEST_USER_EMAIL",
-            "TEST_USER_PASSWORD",
-            "USER_POOL_CLIENT_ID",
-            "USER_POOL_CLIENT_SECRET",
-            "API_BASE_URL",
-        ]:
-            if secret.get(key):
-                os.environ[key] = secret[key]
-
-        # Fetch an access token and set TEST_AUTH_TOKEN
+        secret = fetch_secret(secret_id, region, client=_aws_session(region).client("secretsmanager"))
+    except BaseException as exc:  # noqa: BLE001 - fetch_secret exits on failure
+        # Do not fail the test suite if optional auto-fetch fails
+        print(f"[WARN] Auto-fetch test secrets failed: {exc}")
+        return {}
+
+    # Populate env vars from secret if present
+    for key in [
+        "TEST_USER_EMAIL",
+        "TEST_USER_PASSWORD",
+        "USER_POOL_CLIENT_ID",
+        "USER_POOL_CLIENT_SECRET",
+        "API_BASE_URL",
+    ]:
+        if secret.get(key):
+            os.environ[key] = secret[key]
+    return secret
+
+
+@pytest.fixture(autouse=True)
+def _e2e_secrets(request):
+    """Load the test secret before any e2e test, since most read os.environ directly."""
+    if request.node.get_closest_marker("e2e"):
+        request.getfixturevalue("test_secrets")
+
+
+def _fetch_auth_token(secret):
+    """Get a Cognito access token for the test user, creating the user if needed."""
+    from botocore.exceptions import ClientError
+    from tests.scripts.get_test_auth_token import get_access_token
+
+    region = os.getenv("AWS_REGION", "us-east-1")
+    pool_id = secret.get("USER_POOL_ID") or os.getenv("USER_POOL_ID")
+    username = os.environ["TEST_USER_EMAIL"]
+    password = os.environ["TEST_USER_PASSWORD"]
+    client = _aws_session(region).client("cognito-idp", config=_fast_fail_config())
+
+    def fetch_tokens():
+        return get_access_token(
+            username=username,
+            password=password,
+            client_id=os.environ["USER_POOL_CLIENT_ID"],
+            client_secret=os.environ.get("USER_POOL_CLIENT_SECRET"),
+            region=region,
+            user_pool_id=pool_id,
+            client=client,
+        )
+
+    if not pool_id:
         try:
-            tokens = get_access_token(
-                username=os.environ["TEST_USER_EMAIL"],
-                password=os.environ["TEST_USER_PASSWORD"],
-                client_id=os.environ["USER_POOL_CLIENT_ID"],
-                client_secret=os.environ.get("USER_POOL_CLIENT_SECRET"),
-                region=region,
-                user_pool_id=secret.get("USER_POOL_ID") or os.getenv("USER_POOL_ID"),
-            )
+            return fetch_tokens().get("AccessToken")
         except Exception as _auth_exc:  # noqa: BLE001
-            tokens = {}
+            return None
 
-        if tokens.get("AccessToken"):
-            os.environ["TEST_AUTH_TOKEN"] = tokens["AccessToken"]
+    # Check the user exists while the first auth attempt is in flight, so the
+    # provisioning path below doesn't pay for that round trip afterwards. The
+    # pool is not used as a context manager: when auth succeeds we return
+    # without waiting for the lookup
+    executor = ThreadPoolExecutor(max_workers=2)
+    auth = executor.submit(fetch_tokens)
+    lookup = executor.submit(client.admin_get_user, UserPoolId=pool_id, Username=username)
+    executor.shutdown(wait=False)
+    try:
+        tokens = auth.result()
+    except Exception as _auth_exc:  # noqa: BLE001
+        tokens = {}
+    if tokens.get("AccessToken"):
+        return tokens["AccessToken"]
+
+    # Attempt to create the user and retry
+    try:
+        lookup.result()
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "UserNotFoundException":
+            client.admin_create_user(
+                UserPoolId=pool_id,
+                Username=username,
+                MessageAction="SUPPRESS",
+                TemporaryPassword=password,
+            )
         else:
-            # Attempt to create the user and retry
-            pool_id = secret.get("USER_POOL_ID") or os.getenv("USER_POOL_ID")
-            if pool_id:
-                client = boto3.client("cognito-idp", region_name=region)
-                username = os.environ["TEST_USER_EMAIL"]
-                password = os.environ["TEST_USER_PASSWORD"]
-                try:
-                    # Check if user exists; if not, create and set password
-                    try:
-                        client.admin_get_user(UserPoolId=pool_id, Username=username)
-                    except ClientError as e:
-                        if e.response["Error"]["Code"] == "UserNotFoundException":
-                            client.admin_create_user(
-                                UserPoolId=pool_id,
-                                Username=username,
-                                MessageAction="SUPPRESS",
-                                TemporaryPassword=password,
-                            )
-                        else:
-                            raise
-                    # Ensure password is set and permanent
-                    client.admin_set_user_password(
-                        UserPoolId=pool_id,
-                        Username=username,
-                        Password=password,
-                        Permanent=True,
-                    )
-                    # Retry token fetch
-                    tokens = get_access_token(
-                        username=username,
-                        password=password,
-                        client_id=os.environ["USER_POOL_CLIENT_ID"],
-                        client_secret=os.environ.get("USER_POOL_CLIENT_SECRET"),
-                        region=region,
-                        user_pool_id=pool_id,
-                    )
-                    if tokens.get("AccessToken"):
-                        os.environ["TEST_AUTH_TOKEN"] = tokens["AccessToken"]
-                except Exception as create_exc:  # noqa: BLE001
-                    print(f"[WARN] Auto-fetch failed to create/fetch test user: {create_exc}")
-    except Exception as exc:  # noqa: BLE001
-        # Do not fail the test suite if optional auto-fetch fails
-        print(f"[WARN] Auto-fetch test token failed: {exc}")
+            raise
+
+    # Ensure password is set and permanent
+    client.admin_set_user_password(
+        UserPoolId=pool_id,
+        Username=username,
+        Password=password,
+        Permanent=True,
+    )
+    # Retry token fetch
+    return fetch_tokens().get("AccessToken")
+
+
+@pytest.fixture(scope="session")
+def auth_token(test_secrets):
+    """Access token for the test user; skips the test when none is available.
+
+    Uses TEST_AUTH_TOKEN if set, otherwise fetches one when AUTO_FETCH_TEST_TOKEN is set.
+    """
+    token = os.getenv("TEST_AUTH_TOKEN")
+    if not token and AUTO_FETCH:
+        try:
+            token = _fetch_auth_token(test_secrets)
+        except Exception as exc:  # noqa: BLE001
+            print(f"[WARN] Auto-fetch test token failed: {exc}")
+        if token:
+            os.environ["TEST_AUTH_TOKEN"] = token
+    if not token:
+        pytest.skip("TEST_AUTH_TOKEN not set (requires valid JWT token)")
+    return token
 
 # Import test configuration
 from tests.config import get_config, ENVIRONMENT
@@ -104,8 +165,9 @@ def environment():
     return ENVIRONMENT
 
 @pytest.fixture(scope="session")
-def config():
+def config(test_secrets):
     """Return environment-specific configuration."""
+    # Built after test_secrets so auto-fetched values (API_BASE_URL, pool IDs) are included
     return get_config()
 
 @pytest.fixture(scope="session")
@@ -20,10 +20,11 @@ def test_health_endpoint(api_base_url):
 @pytest.mark.e2e
 def test_api_authentication_flow(api_base_url, config):
     """Test complete authentication flow against real Cognito."""
-    from tests.config import TEST_USER_EMAIL, TEST_USER_PASSWORD
+    from tests.config import get_test_credentials
     
     # Skip if credentials not provided
-    if not TEST_USER_EMAIL or not TEST_USER_PASSWORD:
+    test_user_email, test_user_password = get_test_credentials()
+    if not test_user_email or not test_user_password:
         pytest.skip("Test credentials not configured")
     
     # TODO: Implement actual auth flow
@@ -11,14 +11,9 @@ from botocore.exceptions import ClientError
 
 
 @pytest.mark.e2e
-@pytest.mark.skipif(
-    not os.getenv("TEST_AUTH_TOKEN"),
-    reason="TEST_AUTH_TOKEN not set (requires valid JWT token)"
-)
-def test_api_users_authenticated():
+def test_api_users_authenticated(auth_token):
     """Test authenticated users endpoint with real JWT."""
     api_url = os.getenv("API_BASE_URL")
-    auth_token = os.getenv("TEST_AUTH_TOKEN")
     
     if not api_url:
         pytest.skip("API_BASE_URL not set")
@@ -36,17 +31,12 @@ def test_api_users_authenticated():
 
 
 @pytest.mark.e2e
-@pytest.mark.skipif(
-    not os.getenv("TEST_AUTH_TOKEN"),
-    reason="TEST_AUTH_TOKEN not set (requires valid JWT token)"
-)
-def test_api_users_create_and_update_flow():
+def test_api_users_create_and_update_flow(auth_token):
     """
     End-to-end user journey: ensure we can create (POST) then update (PUT) the user profile.
     Requires valid API_BASE_URL and TEST_AUTH_TOKEN (JWT in access_token cookie).
     """
     api_url = os.getenv("API_BASE_URL")
-    auth_token = os.getenv("TEST_AUTH_TOKEN")
     if not api_url:
         pytest.skip("API_BASE_URL not set")
 
@@ -18,7 +18,9 @@ def mock_dynamodb(monkeypatch):
     monkeypatch.setenv("ENVIRONMENT", "dev")
     monkeypatch.setenv("PROJECT_NAME", "versiful")
     
-    with patch("lambdas.users.helpers.table") as mock_table:
+    # Conditional creates go through the low-level client; route them to the same mock
+    with patch("lambdas.users.helpers.table") as mock_table, \
+            patch("lambdas.users.helpers._ddb_client", mock_table):
         mock_table.get_item.return_value = {"Item": {"userId": "user-123", "isSubscribed": True, "isRegistered": True}}
         mock_table.put_item.return_value = {}
         mock_table.update_item.return_value = {}
@@ -35,11 +35,14 @@ def get_access_token(
     client_secret: str | None = None,
     region: str = "us-east-1",
     user_pool_id: str | None = None,
+    client=None,
 ):
     """
     Try USER_PASSWORD_AUTH first; if that fails and we have a user_pool_id, fall back to ADMIN_USER_PASSWORD_AUTH.
+
+    Pass an existing cognito-idp client to reuse it instead of building a new one.
     """
-    client = boto3.client("cognito-idp", region_name=region)
+    client = client or boto3.client("cognito-idp", region_name=region)
 
     auth_params = {
         "USERNAME": username,
@@ -32,15 +32,7 @@ import boto3
 from botocore.exceptions import ClientError
 
 
-def fetch_secret(secret_id: str, region: str) -> dict:
-    client = boto3.client("secretsmanager", region_name=region)
-    try:
-        resp = client.get_secret_value(SecretId=secret_id)
-    except ClientError as e:
-        print(f"Failed to fetch secret {secret_id}: {e}", file=sys.stderr)
-        sys.exit(2)
-
-    secret_str = resp.get("SecretString")
+def _parse_secret(secret_id: str, secret_str) -> dict:
     if not secret_str:
         print(f"Secret {secret_id} has no SecretString", file=sys.stderr)
         sys.exit(3)
@@ -52,6 +44,41 @@ def fetch_secret(secret_id: str, region: str) -> dict:
         sys.exit(4)
 
 
+def fetch_secrets(secret_ids: list[str], region: str, client=None) -> dict:
+    """Fetch up to 20 JSON secrets in one BatchGetSecretValue call.
+
+    Returns the parsed secrets keyed by both name and ARN. Pass an existing
+    secretsmanager client to reuse it instead of building a new one.
+    """
+    client = client or boto3.client("secretsmanager", region_name=region)
+    try:
+        resp = client.batch_get_secret_value(SecretIdList=list(secret_ids))
+    except ClientError as e:
+        print(f"Failed to fetch secrets {', '.join(secret_ids)}: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    for error in resp.get("Errors", []):
+        print(f"Failed to fetch secret {error.get('SecretId')}: {error.get('Message')}", file=sys.stderr)
+        sys.exit(2)
+
+    secrets = {}
+    for value in resp.get("SecretValues", []):
+        parsed = _parse_secret(value["Name"], value.get("SecretString"))
+        secrets[value["Name"]] = secrets[value["ARN"]] = parsed
+    return secrets
+
+
+def fetch_secret(secret_id: str, region: str, client=None) -> dict:
+    client = client or boto3.client("secretsmanager", region_name=region)
+    try:
+        resp = client.get_secret_value(SecretId=secret_id)
+    except ClientError as e:
+        print(f"Failed to fetch secret {secret_id}: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    return _parse_secret(secret_id, resp.get("SecretString"))
+
+
 def write_env_file(data: dict, path: Path) -> None:
     with path.open("w") as f:
         for key, val in data.items():
@@ -63,7 +90,11 @@ def write_env_file(data: dict, path: Path) -> None:
 
 def main():
     parser = argparse.ArgumentParser(description="Load test secrets into a dotenv file.")
-    parser.add_argument("--secret-id", help="Secrets Manager ID/ARN. Default: {ENVIRONMENT}-{PROJECT_NAME}_secrets")
+    parser.add_argument(
+        "--secret-id",
+        action="append",
+        help="Secrets Manager name/ARN; repeat to merge several (later wins). Default: {ENVIRONMENT}-{PROJECT_NAME}_secrets",
+    )
     parser.add_argument("--region", default=os.getenv("AWS_REGION", "us-east-1"))
     parser.add_argument("--write-env", action="store_true", help="Write .env.test.generated")
     parser.add_argument("--env-file", default=".env.test.generated", help="Path to write dotenv file")
@@ -71,9 +102,17 @@ def main():
 
     environment = os.getenv("ENVIRONMENT", "dev")
     project_name = os.getenv("PROJECT_NAME", "versiful")
-    secret_id = args.secret_id or f"{environment}-{project_name}_secrets"
+    secret_ids = args.secret_id or [f"{environment}-{project_name}_secrets"]
+    secret_id = ", ".join(secret_ids)
 
-    secret = fetch_secret(secret_id, args.region)
+    if len(secret_ids) == 1:
+        secret = fetch_secret(secret_ids[0], args.region)
+    else:
+        # One round trip for all of them
+        fetched = fetch_secrets(secret_ids, args.region)
+        secret = {}
+        for sid in secret_ids:
+            secret.update(fetched[sid])
 
     needed_keys = [
         "TEST_USER_EMAIL",
@@ -0,0 +1,61 @@
+"""
+Unit tests for the shared SMS notification helpers.
+Tests Twilio client reuse with mocked credentials.
+"""
+import sys
+import os
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+
+@pytest.mark.unit
+def test_twilio_client_reused_until_token_rotates(monkeypatch):
+    """Test that one client is kept per credentials and a rotated token gets a new one."""
+    from lambdas.shared import sms_notifications
+    
+    monkeypatch.setattr(sms_notifications, "_TWILIO_CLIENTS", {})
+    
+    first = sms_notifications.get_cached_twilio_client("AC123", "token-1")
+    assert sms_notifications.get_cached_twilio_client("AC123", "token-1") is first
+    
+    rotated = sms_notifications.get_cached_twilio_client("AC123", "token-2")
+    assert rotated is not first
+    assert list(sms_notifications._TWILIO_CLIENTS) == [("AC123", "token-2")]
+
+
+@pytest.mark.unit
+def test_send_sms_batch_keeps_input_order(monkeypatch):
+    """Test that batch results line up with the input and a failed send yields None."""
+    import time
+    from lambdas.shared import sms_notifications
+    
+    def fake_send(phone_number, message):
+        # Later items finish first, so ordering can't come from completion order
+        time.sleep(0.01 * (3 - int(phone_number[-1])))
+        return None if phone_number.endswith("2") else f"SM{phone_number[-1]}"
+    
+    monkeypatch.setattr(sms_notifications, "get_twilio_client", lambda: object())
+    monkeypatch.setattr(sms_notifications, "send_sms", fake_send)
+    
+    items = [("+15555550000", "a"), ("+15555550001", "b"), ("+15555550002", "c")]
+    assert sms_notifications.send_sms_batch(items) == ["SM0", "SM1", None]
+    assert sms_notifications.send_sms_batch([]) == []
+
+
+@pytest.mark.unit
+def test_send_sms_batch_client_failure(monkeypatch):
+    """Test that a Twilio client init failure fails every item without sending."""
+    from unittest.mock import MagicMock
+    from lambdas.shared import sms_notifications
+    
+    def no_credentials():
+        raise ValueError("Twilio credentials not found in secrets")
+    
+    send = MagicMock()
+    monkeypatch.setattr(sms_notifications, "get_twilio_client", no_credentials)
+    monkeypatch.setattr(sms_notifications, "send_sms", send)
+    
+    assert sms_notifications.send_sms_batch([("+15555550000", "a"), ("+15555550001", "b")]) == [None, None]
+    send.assert_not_called()
@@ -70,6 +70,29 @@ def test_is_toll_free_number_real_example(mock_secret):
     assert _is_toll_free_number("+18334543725") == True
 
 
+@pytest.mark.unit
+def test_secrets_fetched_once_per_ttl(monkeypatch):
+    """Test that get_secret and get_twilio_secrets share one cached Secrets Manager fetch."""
+    from unittest.mock import MagicMock
+    from lambdas.sms import helpers
+    
+    client = MagicMock()
+    client.get_secret_value.return_value = {"SecretString": '{"gpt": "k", "twilio_auth": "t"}'}
+    monkeypatch.setattr(helpers, "_secrets_client", client)
+    monkeypatch.setattr(helpers, "_secret_cache", {})
+    
+    assert helpers.get_secret()["gpt"] == "k"
+    assert helpers.get_twilio_secrets()["twilio_auth"] == "t"
+    client.get_secret_value.assert_called_once()
+    
+    # An expired entry is fetched again
+    monkeypatch.setattr(helpers, "SECRET_TTL_SECONDS", -1)
+    helpers._secret_cache.clear()
+    helpers.get_secret()
+    helpers.get_secret()
+    assert client.get_secret_value.call_count == 3
+
+
 # Note: generate_response, send_message, and generate_photo hit real APIs
 # and are better tested in integration/E2E tests with mocked externals.
 
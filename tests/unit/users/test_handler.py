@@ -41,3 +41,42 @@ def test_users_handler_routes(monkeypatch):
     result = handler(event, {})
     assert result["statusCode"] == 404
 
+
+
+@pytest.mark.unit
+def test_users_handler_warmer_ping(monkeypatch):
+    """Test that a scheduled warmer ping returns without routing."""
+    monkeypatch.setenv("ENVIRONMENT", "dev")
+    monkeypatch.setenv("PROJECT_NAME", "versiful")
+    monkeypatch.setattr("lambdas.users.users_handler.get_user_profile", lambda e, _: pytest.fail("routed"))
+    
+    from lambdas.users.users_handler import handler
+    
+    assert handler({"warmer": True}, {}) == {"statusCode": 200, "body": "warm"}
+
+
+@pytest.mark.unit
+def test_welcome_sms_worker_reports_failures(monkeypatch):
+    """Test that the welcome SMS worker sends each record and reports failed ones."""
+    monkeypatch.setenv("ENVIRONMENT", "dev")
+    monkeypatch.setenv("PROJECT_NAME", "versiful")
+    
+    from lambdas.users import users_handler
+    
+    sent = []
+    
+    def fake_send(phone_number, first_name=None):
+        if phone_number == "+15550000000":
+            raise RuntimeError("twilio down")
+        sent.append((phone_number, first_name))
+    
+    monkeypatch.setattr(users_handler, "send_welcome_sms", fake_send)
+    event = {"Records": [
+        {"messageId": "m1", "body": json.dumps({"phoneNumber": "+15555555555", "firstName": "Ann"})},
+        {"messageId": "m2", "body": json.dumps({"phoneNumber": "+15550000000"})},
+    ]}
+    
+    result = users_handler.welcome_sms_worker(event, SimpleNamespace())
+    
+    assert sent == [("+15555555555", "Ann")]
+    assert result == {"batchItemFailures": [{"itemIdentifier": "m2"}]}
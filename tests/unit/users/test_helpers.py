@@ -25,8 +25,13 @@ def mock_env_users(monkeypatch):
 @pytest.fixture
 def mock_dynamodb_table(mock_env_users):
     """Mock DynamoDB table for users helpers."""
+    from lambdas.users import helpers
+    helpers._PHONE_BY_USER.clear()
+    helpers._PROFILE_CACHE.clear()
     with patch("lambdas.users.helpers.table") as mock_table:
         yield mock_table
+    helpers._PHONE_BY_USER.clear()
+    helpers._PROFILE_CACHE.clear()
 
 
 @pytest.mark.unit
@@ -34,18 +39,21 @@ def test_create_user_new_user(mock_dynamodb_table):
     """Test creating a new user when user doesn't exist."""
     from lambdas.users.helpers import create_user
     
-    mock_dynamodb_table.get_item.return_value = {}
-    mock_dynamodb_table.put_item.return_value = {}
-    
     event = {"requestContext": {"authorizer": {"userId": "user-123"}}}
     
-    result = create_user(event, {})
+    with patch("lambdas.users.helpers._ddb_client") as mock_client:
+        mock_client.put_item.return_value = {}
+        result = create_user(event, {})
     
     assert result["statusCode"] == 200
     body = json.loads(result["body"])
     assert body["isSubscribed"] is False
     assert body["isRegistered"] is False
-    mock_dynamodb_table.put_item.assert_called_once()
+    mock_client.put_item.assert_called_once()
+    put_kwargs = mock_client.put_item.call_args.kwargs
+    assert put_kwargs["Item"]["userId"] == {"S": "user-123"}
+    assert put_kwargs["ConditionExpression"] == "attribute_not_exists(userId)"
+    mock_dynamodb_table.get_item.assert_not_called()
 
 
 @pytest.mark.unit
@@ -63,13 +71,17 @@ def test_create_user_existing_user(mock_dynamodb_table):
     
     event = {"requestContext": {"authorizer": {"userId": "user-123"}}}
     
-    result = create_user(event, {})
+    with patch("lambdas.users.helpers._ddb_client") as mock_client:
+        mock_client.put_item.side_effect = ClientError(
+            {"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem"
+        )
+        result = create_user(event, {})
     
     assert result["statusCode"] == 200
     body = json.loads(result["body"])
     assert body["isSubscribed"] is True
     assert body["isRegistered"] is True
-    mock_dynamodb_table.put_item.assert_not_called()
+    mock_dynamodb_table.get_item.assert_called_once()
 
 
 @pytest.mark.unit
@@ -106,6 +118,50 @@ def test_get_user_profile_success(mock_dynamodb_table):
     assert body["isSubscribed"] is True
 
 
+@pytest.mark.unit
+def test_get_user_profile_batches_reads_once_phone_known(mock_dynamodb_table):
+    """Test that a known phone lets the profile and SMS usage come from one batch read."""
+    from lambdas.users import helpers
+    
+    helpers._PHONE_BY_USER["user-123"] = "+15555555555"
+    batch_response = {
+        "Responses": {
+            helpers.table_name: [{"userId": "user-123", "phoneNumber": "+15555555555"}],
+            helpers.sms_usage_table_name: [{"phoneNumber": "+15555555555", "plan_messages_sent": 3}],
+        },
+        "UnprocessedKeys": {},
+    }
+    
+    with patch("lambdas.users.helpers.dynamodb") as mock_dynamodb:
+        mock_dynamodb.batch_get_item.return_value = batch_response
+        event = {"requestContext": {"authorizer": {"userId": "user-123"}}}
+        result = helpers.get_user_profile(event, {})
+    
+    assert result["statusCode"] == 200
+    body = json.loads(result["body"])
+    assert body["smsUsage"]["messagesSent"] == 3
+    assert body["smsUsage"]["messageLimit"] == 5
+    mock_dynamodb.batch_get_item.assert_called_once()
+    mock_dynamodb_table.get_item.assert_not_called()
+
+
+@pytest.mark.unit
+def test_get_user_profile_reuses_recent_read(mock_dynamodb_table):
+    """Test that repeat profile reads on a warm container hit DynamoDB once until a settings write."""
+    from lambdas.users.helpers import get_user_profile, update_user_settings
+    
+    mock_dynamodb_table.get_item.return_value = {"Item": {"userId": "user-123", "isSubscribed": False}}
+    event = {"requestContext": {"authorizer": {"userId": "user-123"}}}
+    
+    get_user_profile(event, {})
+    get_user_profile(event, {})
+    assert mock_dynamodb_table.get_item.call_count == 1
+    
+    update_user_settings({**event, "body": json.dumps({"bibleVersion": "KJV"})}, {})
+    get_user_profile(event, {})
+    assert mock_dynamodb_table.get_item.call_count == 2
+
+
 @pytest.mark.unit
 def test_get_user_profile_not_found(mock_dynamodb_table):
     """Test retrieving non-existent user profile."""
@@ -138,13 +194,22 @@ def test_update_user_settings_success(mock_dynamodb_table):
         })
     }
     
-    result = update_user_settings(event, {})
+    with patch("lambdas.users.helpers._ddb_client") as mock_client, \
+         patch("lambdas.users.helpers.link_sms_history_to_user") as mock_link:
+        result = update_user_settings(event, {})
     
     assert result["statusCode"] == 200
     body = json.loads(result["body"])
     assert body["message"] == "Settings updated"
-    mock_dynamodb_table.get_item.assert_called_once()
-    mock_dynamodb_table.update_item.assert_called_once()
+    mock_dynamodb_table.get_item.assert_not_called()
+    # Phone changes write the user and the sms-usage link in one transaction
+    mock_dynamodb_table.update_item.assert_not_called()
+    transact_items = mock_client.transact_write_items.call_args.kwargs["TransactItems"]
+    assert [t["Update"]["Key"] for t in transact_items] == [
+        {"userId": {"S": "user-123"}},
+        {"phoneNumber": {"S": "+15555555555"}},
+    ]
+    mock_link.assert_called_once_with("+15555555555", "user-123")
 
 
 @pytest.mark.unit
@@ -164,13 +229,24 @@ def test_update_user_settings_no_valid_fields(mock_dynamodb_table):
     assert "No valid fields" in body["message"]
 
 
+@pytest.mark.unit
+def test_update_user_settings_empty_body(mock_dynamodb_table):
+    """Test that a PUT without a body is rejected without parsing it."""
+    from lambdas.users.helpers import update_user_settings
+    
+    event = {"requestContext": {"authorizer": {"userId": "user-123"}}, "body": None}
+    
+    result = update_user_settings(event, {})
+    
+    assert result["statusCode"] == 400
+    mock_dynamodb_table.update_item.assert_not_called()
+
+
 @pytest.mark.unit
 def test_update_user_settings_creates_missing_user(mock_dynamodb_table):
-    """Test update when user does not exist: should create then update without error."""
+    """Test update when user does not exist: a single upsert sets createdAt if missing."""
     from lambdas.users.helpers import update_user_settings
     
-    mock_dynamodb_table.get_item.return_value = {}
-    mock_dynamodb_table.put_item.return_value = {}
     mock_dynamodb_table.update_item.return_value = {}
     
     event = {
@@ -181,7 +257,67 @@ def test_update_user_settings_creates_missing_user(mock_dynamodb_table):
     result = update_user_settings(event, {})
     
     assert result["statusCode"] == 200
-    mock_dynamodb_table.get_item.assert_called_once()
-    mock_dynamodb_table.put_item.assert_called_once()
+    mock_dynamodb_table.get_item.assert_not_called()
+    mock_dynamodb_table.put_item.assert_not_called()
     mock_dynamodb_table.update_item.assert_called_once()
+    update_kwargs = mock_dynamodb_table.update_item.call_args.kwargs
+    assert "createdAt = if_not_exists(createdAt, :createdAt)" in update_kwargs["UpdateExpression"]
 
+
+
+@pytest.mark.unit
+def test_update_user_settings_queues_welcome_sms(mock_dynamodb_table):
+    """Test that a new registration enqueues the welcome SMS instead of sending inline."""
+    from lambdas.users.helpers import update_user_settings
+    
+    mock_dynamodb_table.update_item.return_value = {}
+    
+    event = {
+        "requestContext": {"authorizer": {"userId": "user-123"}},
+        "body": json.dumps({"isRegistered": True, "phoneNumber": "5555555555", "firstName": "Ann"})
+    }
+    
+    with patch("lambdas.users.helpers.welcome_sms_queue_url", "https://sqs.test/welcome"), \
+         patch("lambdas.users.helpers.sqs") as mock_sqs, \
+         patch("lambdas.users.helpers._ddb_client"), \
+         patch("lambdas.users.helpers.link_sms_history_to_user"), \
+         patch("lambdas.users.helpers.send_welcome_sms") as mock_send:
+        result = update_user_settings(event, {})
+    
+    assert result["statusCode"] == 200
+    mock_send.assert_not_called()
+    sent = mock_sqs.send_message.call_args.kwargs
+    assert sent["QueueUrl"] == "https://sqs.test/welcome"
+    assert json.loads(sent["MessageBody"]) == {"phoneNumber": "+15555555555", "firstName": "Ann"}
+
+
+@pytest.mark.unit
+def test_get_user_profile_cache_evicts_least_recently_used(mock_dynamodb_table):
+    """Test that a full profile cache drops the least recently read user."""
+    from lambdas.users import helpers
+    
+    mock_dynamodb_table.get_item.side_effect = lambda Key: {"Item": {"userId": Key["userId"]}}
+    
+    with patch("lambdas.users.helpers._PROFILE_CACHE_MAX", 2):
+        for user_id in ["user-1", "user-2", "user-1", "user-3"]:
+            helpers.get_user_profile({"requestContext": {"authorizer": {"userId": user_id}}}, {})
+    
+    assert list(helpers._PROFILE_CACHE) == ["user-1", "user-3"]
+    assert mock_dynamodb_table.get_item.call_count == 3
+
+
+@pytest.mark.unit
+def test_update_user_settings_reuses_update_expression(mock_dynamodb_table):
+    """Test that the same field set maps to one cached UpdateExpression regardless of order."""
+    from lambdas.users.helpers import update_user_settings
+    
+    mock_dynamodb_table.update_item.return_value = {}
+    
+    for body in ({"firstName": "Ann", "bibleVersion": "KJV"}, {"bibleVersion": "NIV", "firstName": "Bo"}):
+        event = {"requestContext": {"authorizer": {"userId": "user-123"}}, "body": json.dumps(body)}
+        assert update_user_settings(event, {})["statusCode"] == 200
+    
+    first, second = [c.kwargs for c in mock_dynamodb_table.update_item.call_args_list]
+    assert first["UpdateExpression"] is second["UpdateExpression"]
+    assert first["ExpressionAttributeNames"] == {"#bibleVersion": "bibleVersion", "#firstName": "firstName"}
+    assert second["ExpressionAttributeValues"][":firstName"] == "Bo"